@@ -0,0 +1,213 @@
+"""
+DeepSeek 连接池 + 相同请求合并 (single-flight)
+
+Streamlit 每次交互都会重跑 app.py。客户端如果在模块顶层创建，每个会话都会重新握手 TLS。
+这里的客户端每个进程只创建一次 (app.py 通过 boot.py，api_server.py 在每个 worker 里)，共用一个 keep-alive 连接池。
+不同会话同时发出完全相同的 prompt 时，只有第一个真正调用 API，其余的等待并共享同一份结果。
+openai / httpx 导入很慢 (约 0.6 秒)，放到 make_client() 里，不拖慢进程启动 (见 boot.py)。
+"""
+import hashlib
+import os
+import threading
+import time
+
+# 压测 / 基准测试时可指向 fake_deepseek.py
+DEEPSEEK_BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+
+
+def make_client(api_key, base_url=DEEPSEEK_BASE_URL, max_connections=100, max_keepalive=20):
+    """创建带连接池的 OpenAI 兼容客户端 (重试交给 ai_scheduler，SDK 自身不重试)"""
+    from openai import DefaultHttpxClient, OpenAI
+
+    try:
+        import httpx
+    except ImportError:  # 较新的 openai SDK 依赖 httpx2 (API 相同)
+        import httpx2 as httpx
+
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=60.0,
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def prompt_key(*parts):
+    """相同 prompt (及参数) -> 相同的合并键"""
+    raw = "\x00".join(str(p) for p in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    """上游流只消费一次，片段存进缓冲区，每个订阅者各自从头读。
+    所有订阅者都离开 (leave) 后设置 cancel，上游在下一个片段处断开 (排队中的请求不再发出)"""
+
+    def __init__(self):
+        self.pieces = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.cancel = threading.Event()
+        self.subscribers = 0
+        self.first_piece_at = None
+        self._callbacks = []
+
+    def feed(self, fn):
+        it = iter(())
+        try:
+            it = iter(fn(self.cancel))
+            for piece in it:
+                with self.cond:
+                    if self.first_piece_at is None:
+                        self.first_piece_at = time.monotonic()
+                    self.pieces.append(piece)
+                    self.cond.notify_all()
+                if self.cancel.is_set():
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+            with self.cond:
+                self.finished = True
+                self.cond.notify_all()
+                callbacks, self._callbacks = self._callbacks, None
+            for callback in callbacks:
+                callback(self)
+
+    # --- 订阅者 ---
+
+    def join(self):
+        """已经被放弃的广播不能再加入 (输出会被截断)"""
+        with self.cond:
+            if self.cancel.is_set():
+                return False
+            self.subscribers += 1
+            return True
+
+    def leave(self):
+        with self.cond:
+            self.subscribers -= 1
+            if self.subscribers <= 0 and not self.finished:
+                self.cancel.set()
+
+    def subscribe(self):
+        i = 0
+        try:
+            while True:
+                with self.cond:
+                    while i >= len(self.pieces) and not self.finished:
+                        self.cond.wait()
+                    batch = self.pieces[i:]
+                    i += len(batch)
+                    finished = self.finished and i >= len(self.pieces)
+                yield from batch
+                if finished:
+                    break
+        finally:
+            self.leave()
+        if self.error is not None:
+            raise self.error
+
+    # --- 不阻塞的读取 (给轮询用) ---
+
+    def text(self):
+        with self.cond:
+            return "".join(self.pieces)
+
+    @property
+    def completed(self):
+        """完整输出、没有出错、也没有被放弃"""
+        return self.finished and self.error is None and not self.cancel.is_set()
+
+    def wait(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.finished, timeout)
+
+    def add_done_callback(self, callback):
+        """结束后在上游线程里调用 callback(broadcast)；已经结束则立即调用"""
+        with self.cond:
+            if self._callbacks is not None:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+
+class SingleFlight:
+    """按 key 合并进行中的请求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """阻塞调用：同一 key 同时只执行一次 fn()，其余调用者拿同一个结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def watch(self, key, fn):
+        """流式调用：fn(cancel) 返回片段迭代器，在后台线程里只消费一次；返回共享的 _Broadcast。
+        调用者用 text() / finished 轮询，不再需要时调用 leave()"""
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is not None and broadcast.join():
+                self.coalesced += 1
+                return broadcast
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.join()
+            self.leaders += 1
+        threading.Thread(target=self._run_stream, args=(key, broadcast, fn), daemon=True).start()
+        return broadcast
+
+    def stream(self, key, fn):
+        """同 watch()，返回本调用者的订阅迭代器 (阻塞读取；迭代器关闭时自动 leave)"""
+        return self.watch(key, fn).subscribe()
+
+    def _run_stream(self, key, broadcast, fn):
+        try:
+            broadcast.feed(fn)
+        finally:
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+
+    def stats(self):
+        return {"leaders": self.leaders, "coalesced": self.coalesced}
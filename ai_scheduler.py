@@ -0,0 +1,248 @@
+"""
+DeepSeek 请求调度器：并发上限 + 截止时间 + 抖动重试 + 排队上限 (背压)
+
+- 有界线程池：同时最多 max_workers 个上游请求
+- 每个请求有截止时间 (包括排队时间)，Streamlit 脚本线程不会被无限卡住
+- 只对可重试的错误 (连接失败、超时、429、5xx) 做指数退避 + 随机抖动重试
+- 排队超过 max_queue 时直接拒绝 (Overloaded)，由调用方显示中文提示
+- 流式调用可以取消：没人等结果的请求不再发出 / 提前断开 (见 ai_tasks.py)
+- 记录排队等待时间与服务时间
+"""
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+CANCEL_POLL = 0.2  # 流式调用等待片段时检查 cancel 的间隔 (秒)
+
+
+class Overloaded(Exception):
+    """排队已满，请求被拒绝"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """超过截止时间"""
+
+
+def is_retryable(e):
+    # openai 按需导入 (见 ai_pool.make_client)；还没导入时异常不可能来自 SDK
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(e, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return getattr(e, "status_code", None) in RETRYABLE_STATUS
+
+
+class Histogram:
+    """保留最近 N 个样本，用来算分位数"""
+
+    def __init__(self, window=2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.samples.append(value)
+            self.count += 1
+            self.total += value
+
+    def quantile(self, q):
+        with self._lock:
+            data = sorted(self.samples)
+        if not data:
+            return 0.0
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class AIScheduler:
+    """所有 DeepSeek 调用都经过这里。fn 的签名是 fn(timeout)，timeout 为剩余秒数"""
+
+    def __init__(self, max_workers=8, max_queue=32, deadline=60.0, max_retries=2, backoff=0.5):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deepseek")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.counters = {"submitted": 0, "shed": 0, "timeouts": 0, "retries": 0, "errors": 0, "cancelled": 0}
+        self.queue_wait = Histogram()
+        self.service_time = Histogram()
+
+    # --- 排队与计数 ---
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _admit(self):
+        with self._lock:
+            # 正在执行的占满 max_workers 之后，最多再排 max_queue 个
+            if self.queued + self.running >= self.max_workers + self.max_queue:
+                self.counters["shed"] += 1
+                raise Overloaded("当前咨询人数过多，请稍后再试")
+            self.queued += 1
+            self.counters["submitted"] += 1
+        return time.monotonic()
+
+    def _start(self, enqueued_at):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        self.queue_wait.observe(time.monotonic() - enqueued_at)
+        return time.monotonic()
+
+    def _finish(self, started_at):
+        with self._lock:
+            self.running -= 1
+        self.service_time.observe(time.monotonic() - started_at)
+
+    def _with_retries(self, fn, deadline_at, cancelled=None):
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("DeepSeek 响应超时")
+            try:
+                return fn(remaining)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e) or (cancelled is not None and cancelled()):
+                    raise
+                # 指数退避 + 抖动，避免所有会话同时重试
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                attempt += 1
+                self._count("retries")
+                time.sleep(delay)
+
+    # --- 阻塞调用 ---
+
+    def call(self, fn, deadline=None):
+        """在线程池中执行 fn(timeout)，最多等待到截止时间"""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        enqueued_at = self._admit()
+        future = self._pool.submit(self._run, fn, enqueued_at, deadline_at)
+        try:
+            return future.result(timeout=max(0.0, deadline_at - time.monotonic()))
+        except FutureTimeout:
+            self._count("timeouts")
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise DeadlineExceeded("DeepSeek 响应超时")
+
+    def _run(self, fn, enqueued_at, deadline_at):
+        started_at = self._start(enqueued_at)
+        try:
+            return self._with_retries(fn, deadline_at)
+        except Exception:
+            self._count("errors")
+            raise
+        finally:
+            self._finish(started_at)
+
+    # --- 流式调用 ---
+
+    def stream(self, fn, deadline=None, cancel=None):
+        """fn(timeout) 返回片段迭代器；在线程池中消费，调用者按顺序取出片段。
+        只在收到第一个片段之前重试，已经输出的内容不会重复。
+        cancel (threading.Event) 被设置或调用者关闭迭代器后：还在排队的请求不再发出，
+        正在输出的在下一个片段处关闭上游迭代器 (断开连接)"""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        enqueued_at = self._admit()
+        pieces = queue.Queue()
+        stop = threading.Event()
+
+        def cancelled():
+            return stop.is_set() or (cancel is not None and cancel.is_set())
+
+        def open_stream(remaining):
+            it = iter(fn(remaining))
+            try:
+                return it, next(it, _END)
+            except BaseException:
+                # 这次尝试失败：先关掉它的上游流 (归还连接池里的连接)，再交给 _with_retries 重试
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+                raise
+
+        def worker():
+            started_at = self._start(enqueued_at)
+            it = None
+            try:
+                if cancelled():
+                    self._count("cancelled")
+                    return
+                it, piece = self._with_retries(open_stream, deadline_at, cancelled)
+                while piece is not _END:
+                    if cancelled():
+                        self._count("cancelled")
+                        return
+                    pieces.put(piece)
+                    if time.monotonic() > deadline_at:
+                        raise DeadlineExceeded("DeepSeek 响应超时")
+                    piece = next(it, _END)
+                pieces.put(_END)
+            except Exception as e:
+                self._count("errors")
+                pieces.put(_Failure(e))
+            finally:
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+                self._finish(started_at)
+
+        self._pool.submit(worker)
+        try:
+            while True:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    self._count("timeouts")
+                    raise DeadlineExceeded("DeepSeek 响应超时")
+                try:
+                    # 有 cancel 时分段等待，放弃后不必等到下一个片段才返回
+                    item = pieces.get(timeout=min(remaining, CANCEL_POLL) if cancel is not None else remaining)
+                except queue.Empty:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    continue
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+
+    def stats(self):
+        with self._lock:
+            out = dict(self.counters, queued=self.queued, running=self.running)
+        out["queue_wait"] = self.queue_wait.summary()
+        out["service_time"] = self.service_time.summary()
+        return out
@@ -0,0 +1,142 @@
+"""
+每个会话的后台 AI 任务 (不依赖 Streamlit)
+
+以前点击“分析”后，脚本线程一直消费 DeepSeek 的流直到结束；学生中途改成绩或再点一次，
+旧请求照样跑完 (占着线程和上游连接)，结果却被丢掉。现在：
+
+- 任务只是 single-flight 广播 (ai_pool.SingleFlight.watch) 的一个订阅：上游片段由后台线程写进
+  共享缓冲区，任务本身不占线程；页面用 run_every fragment 轮询 text() / done
+- start()：同样输入的任务还在进行 (或已成功) 就直接复用，连点几次也只有一个请求；
+  输入变了就放弃旧任务。放弃 = 离开广播：没有其他会话在等同一个 prompt 时，
+  排队中的请求不再发出，正在输出的在下一个片段处断开 (见 AIScheduler.stream 的 cancel)
+- 每个会话同时最多 MAX_OUTSTANDING 个未结束的任务 (包括已放弃、上游还没断开的)，
+  超过时 start() 抛出 TooManyTasks
+"""
+import time
+from dataclasses import dataclass
+
+MAX_OUTSTANDING = 3
+
+
+class TooManyTasks(Exception):
+    """这个会话未结束的任务太多"""
+
+
+@dataclass(frozen=True, slots=True)
+class TaskError:
+    """上游错误的摘要。异常对象引用着 httpx 的请求 / 响应和响应体 (几十 KB)，不放进会话"""
+    kind: str           # 异常类名 (指标标签用)
+    message: str
+
+    @classmethod
+    def from_exception(cls, e):
+        return cls(kind=type(e).__name__, message=str(e))
+
+    def __str__(self):
+        return self.message
+
+
+class AdviceTask:
+    """一次 AI 建议请求；key 是这次分析的输入 (建议缓存的 key)。
+    上游结束后把最终文字 / 错误摘要复制出来，不再引用广播 (会话里只留几个字符串)"""
+
+    __slots__ = ("key", "flight", "started", "abandoned", "_text", "_error", "_ttft")
+
+    def __init__(self, key, flight):
+        self.key = key
+        self.flight = flight
+        self.started = time.monotonic()
+        self.abandoned = False
+        self._text = ""
+        self._error = None
+        self._ttft = None
+
+    def _live(self):
+        """还在进行时返回广播；已经结束则结算并返回 None"""
+        flight = self.flight
+        if flight is None or not flight.finished:
+            return flight
+        first = flight.first_piece_at
+        self._ttft = None if first is None else max(0.0, first - self.started)
+        self._text = flight.text()
+        # 只留类名和消息：异常本身引用着上游线程的栈帧和整个 HTTP 响应
+        self._error = TaskError.from_exception(flight.error) if flight.error is not None else None
+        self.flight = None
+        return None
+
+    @property
+    def text(self):
+        flight = self._live()
+        return self._text if flight is None else flight.text()
+
+    @property
+    def done(self):
+        return self._live() is None
+
+    @property
+    def error(self):
+        """结束且出错时返回 TaskError，否则为 None"""
+        self._live()
+        return self._error
+
+    @property
+    def completed(self):
+        """完整输出、没有出错、也没有被放弃"""
+        return self.done and self._error is None and not self.abandoned and bool(self._text)
+
+    @property
+    def ttft(self):
+        """点击到第一个片段的秒数；加入别人已经在输出的请求时为 0"""
+        flight = self._live()
+        if flight is None:
+            return self._ttft
+        first = flight.first_piece_at
+        return None if first is None else max(0.0, first - self.started)
+
+    def wait(self, timeout=None):
+        flight = self.flight
+        return True if flight is None else flight.wait(timeout)
+
+    def abandon(self):
+        if not self.abandoned:
+            self.abandoned = True
+            flight = self.flight
+            if flight is not None:
+                flight.leave()
+
+
+class SessionTasks:
+    """一个会话的任务表 (存放在 st.session_state 里)"""
+
+    __slots__ = ("current", "stale", "max_outstanding")
+
+    def __init__(self, max_outstanding=MAX_OUTSTANDING):
+        self.current = None
+        self.stale = []          # 已放弃、上游还没结束的任务
+        self.max_outstanding = max_outstanding
+
+    def get(self, key):
+        task = self.current
+        return task if task is not None and task.key == key else None
+
+    def start(self, key, open_flight, on_done=None):
+        """返回 key 对应的任务：能复用就复用，否则放弃当前任务并用 open_flight() 开一个新的。
+        on_done(task) 只对新任务注册，在上游线程里调用"""
+        task = self.current
+        if task is not None and task.key == key and (not task.done or task.error is None):
+            return task
+
+        if task is not None:
+            task.abandon()
+            if not task.done:
+                self.stale.append(task)
+            self.current = None
+        self.stale = [t for t in self.stale if not t.done]
+        if len(self.stale) + 1 > self.max_outstanding:
+            raise TooManyTasks("上一次的分析还在取消中，请稍后再试")
+
+        task = self.current = AdviceTask(key, open_flight())
+        if on_done is not None:
+            task.flight.add_done_callback(lambda _flight: on_done(task))
+        return task
+
@@ -0,0 +1,383 @@
+"""
+奖学金匹配 JSON API (标准库 http.server，多进程 pre-fork；不依赖 Streamlit)
+
+给合作学校的系统直接调用：不用抓取 Streamlit 页面，也不占用 websocket 和整页脚本重跑。
+
+    POST /match          一个学生 -> 符合资格的奖学金 ("near_misses": true 时附带“差一点”列表)
+    POST /match/batch    {"students": [...]}，最多 MAX_BATCH 个，单个学生出错不影响其他结果
+    POST /advice         一个学生 + "wish" -> DeepSeek 建议 (需要环境变量 DEEPSEEK_API_KEY)
+    GET  /healthz        目录版本、条目数、worker 进程号
+    GET  /metrics        本 worker 的 Prometheus 指标
+
+学生格式与 benchmarks/synth.py 相同：
+    {"grades": {"Bahasa Melayu": "A+", ...}, "state": "Selangor",
+     "religion": "Islam" | "Non-Muslim", "race": "Bumiputera" | "Non-Bumiputera", "koko": 8.5}
+
+主进程先加载并编译目录 (CatalogStore)、预先序列化卡片摘要，再绑定端口，然后 fork 出 N 个 worker
+共用同一个监听 socket。编译好的规则和位图索引通过 copy-on-write 共享，worker 一启动就是热的；
+数据文件更新后每个 worker 各自按 mtime 重新加载。DeepSeek 客户端、调度器和建议缓存在 worker 里
+第一次用到时才创建 (fork 之前不创建线程和连接)。worker 意外退出时主进程补一个新的。
+
+    python api_server.py --port 8600 --workers 4
+    python -m benchmarks.api_load --workers 4       # 本地压测，报告 p50 / p99
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ai_pool
+import engine
+import prompts
+import ranking
+import telemetry
+import whatif
+from ai_scheduler import AIScheduler, DeadlineExceeded, Overloaded
+from cache import AdviceCache, advice_key
+from catalog import CatalogStore
+from scholarship_data import CATALOGUE_PATH, GRADES
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH = 1000
+RELIGIONS = ("Islam", "Non-Muslim")
+RACES = ("Bumiputera", "Non-Bumiputera")
+# 返回给调用方的条目字段 (门槛细节留在服务端)
+SUMMARY_FIELDS = ("name", "provider", "kind", "tags", "income_req", "desc", "link")
+NEAR_MISS_MAX_UPGRADES = 3
+
+
+class RequestError(ValueError):
+    """请求内容不合法；errors 列出所有问题"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("；".join(self.errors))
+
+
+# --- 1. 请求解析 ---
+
+def parse_student(raw, catalog, where="student"):
+    """校验并返回 (Profile, religion, race)；不合法时抛出 RequestError"""
+    if not isinstance(raw, dict):
+        raise RequestError([f"{where} 必须是对象"])
+    errors = []
+    grades = raw.get("grades")
+    if not isinstance(grades, dict) or not grades:
+        errors.append(f"{where}.grades 必须是非空对象 (科目 -> 等级)")
+        grades = {}
+    for sub, grade in grades.items():
+        if sub not in catalog.subjects:
+            errors.append(f"{where}.grades 未知科目 {sub!r}")
+        elif grade not in GRADES:
+            errors.append(f"{where}.grades[{sub!r}] 无效等级 {grade!r}")
+    state = raw.get("state")
+    if state not in catalog.states:
+        errors.append(f"{where}.state 未知州属 {state!r}")
+    religion = raw.get("religion", RELIGIONS[1])
+    if religion not in RELIGIONS:
+        errors.append(f"{where}.religion 必须是 {'/'.join(RELIGIONS)}")
+    race = raw.get("race", RACES[1])
+    if race not in RACES:
+        errors.append(f"{where}.race 必须是 {'/'.join(RACES)}")
+    koko = raw.get("koko", 0)
+    if isinstance(koko, bool) or not isinstance(koko, (int, float)) or not 0 <= koko <= 10:
+        errors.append(f"{where}.koko 必须是 0-10 之间的数字")
+    if errors:
+        raise RequestError(errors)
+    profile = engine.make_profile(grades, state, religion == "Islam", race == "Bumiputera", koko)
+    return profile, religion, race
+
+
+# --- 2. 匹配结果 (JSON 片段拼接) ---
+
+@lru_cache(maxsize=4)
+def _summaries(catalog):
+    """每个目录版本只序列化一次：id(条目) -> 条目摘要的 JSON 文本"""
+    out = {}
+    for sch in catalog.db:
+        fields = {key: sch[key] for key in SUMMARY_FIELDS if key in sch}
+        fields["tags"] = list(fields["tags"])
+        fields.setdefault("kind", "scholarship")
+        out[id(sch)] = json.dumps(fields, ensure_ascii=False)
+    return out
+
+
+def _near_miss_json(profile, catalog):
+    near = whatif.near_misses(profile, catalog.rules, max_upgrades=NEAR_MISS_MAX_UPGRADES)
+    return json.dumps([
+        {"name": m.sch["name"],
+         "upgrades": [{"subject": u.subject, "from": u.from_grade, "to": u.to_grade} for u in m.upgrades]}
+        for m in near
+    ], ensure_ascii=False)
+
+
+def match_json(profile, catalog, near_misses=False):
+    """一个学生的结果 (JSON 对象文本)；条目摘要直接拼接，不逐个重新序列化"""
+    summaries = _summaries(catalog)
+    eligible = catalog.match(profile)
+    body = f'"count":{len(eligible)},"eligible":[{",".join(summaries[id(sch)] for sch in eligible)}]'
+    if near_misses:
+        body += f',"near_misses":{_near_miss_json(profile, catalog)}'
+    return "{" + body + "}"
+
+
+# --- 3. DeepSeek (每个 worker 懒加载) ---
+
+_ai = None
+_ai_lock = threading.Lock()
+
+
+def get_ai(api_key):
+    """(client, scheduler, single_flight, advice_cache)；第一次调用 /advice 时才创建"""
+    global _ai
+    with _ai_lock:
+        if _ai is None:
+            _ai = (ai_pool.make_client(api_key), AIScheduler(), ai_pool.SingleFlight(), AdviceCache())
+        return _ai
+
+
+def _ask(client, prompt_text, timeout):
+    started = time.perf_counter()
+    response = client.chat.completions.create(
+        model="deepseek-chat",
+        messages=prompts.build_messages(prompt_text),
+        temperature=0.7,
+        max_tokens=1000,
+        timeout=timeout,
+    )
+    telemetry.observe("spm_ai_request_seconds", time.perf_counter() - started, help="Upstream DeepSeek call latency", mode="api")
+    telemetry.record_ai_usage(response.usage)
+    return response.choices[0].message.content.strip()
+
+
+# --- 4. HTTP ---
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive：合作方的连接池可以复用连接
+    server_version = "spm-api"
+    # 响应头和响应体分两次写出；不关 Nagle 的话会撞上客户端的延迟 ACK，每个请求白等 40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8", headers=()):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self._status = status
+
+    def _error(self, status, message, details=(), headers=()):
+        payload = {"error": message}
+        if details:
+            payload["details"] = list(details)
+        self._send(status, json.dumps(payload, ensure_ascii=False), headers=headers)
+
+    def _read_json(self):
+        # 请求体长度不对时没法继续用这个连接
+        self.close_connection = True
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise RequestError(["缺少 Content-Length"]) from None
+        if length > MAX_BODY_BYTES:
+            raise RequestError([f"请求体超过 {MAX_BODY_BYTES} 字节"])
+        self.close_connection = False
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError as e:
+            raise RequestError([f"JSON 格式错误：{e}"]) from None
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/healthz":
+            catalog = self.server.store.current()
+            self._send(200, json.dumps({
+                "status": "ok", "catalogue_version": catalog.version,
+                "scholarships": len(catalog.db), "pid": os.getpid(),
+            }))
+        elif path == "/metrics":
+            self._send(200, telemetry.REGISTRY.render(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._error(404, "not found")
+
+    def do_POST(self):
+        route = self.path.split("?")[0]
+        handler = self.ROUTES.get(route)
+        started = time.perf_counter()
+        self._status = 500
+        try:
+            if handler is None:
+                # 请求体没读完会弄乱 keep-alive 连接上的下一个请求
+                self.close_connection = True
+                self._error(404, "not found")
+                return
+            handler(self, self._read_json(), self.server.store.current())
+        except RequestError as e:
+            self._error(400, "invalid request", e.errors)
+        except Exception as e:
+            self._error(500, f"{type(e).__name__}: {e}")
+        finally:
+            route = route if handler is not None else "other"
+            telemetry.observe("spm_api_request_seconds", time.perf_counter() - started, help="JSON API request latency", route=route)
+            telemetry.inc("spm_api_requests_total", help="JSON API requests", route=route, status=str(self._status))
+
+    def match(self, body, catalog):
+        if not isinstance(body, dict):
+            raise RequestError(["请求体必须是对象"])
+        profile, _, _ = parse_student(body, catalog)
+        result = match_json(profile, catalog, near_misses=body.get("near_misses") is True)
+        self._send(200, f'{{"catalogue_version":"{catalog.version}",' + result[1:])
+
+    def match_batch(self, body, catalog):
+        students = body.get("students") if isinstance(body, dict) else None
+        if not isinstance(students, list):
+            raise RequestError(["students 必须是列表"])
+        if len(students) > MAX_BATCH:
+            raise RequestError([f"一次最多 {MAX_BATCH} 个学生"])
+        results = []
+        for i, raw in enumerate(students):
+            try:
+                profile, _, _ = parse_student(raw, catalog, where=f"students[{i}]")
+            except RequestError as e:
+                results.append(json.dumps({"error": "invalid student", "details": e.errors}, ensure_ascii=False))
+                continue
+            results.append(match_json(profile, catalog))
+        self._send(200, f'{{"catalogue_version":"{catalog.version}","results":[{",".join(results)}]}}')
+
+    def advice(self, body, catalog):
+        api_key = os.environ.get("DEEPSEEK_API_KEY")
+        if not api_key:
+            self._error(503, "DEEPSEEK_API_KEY 未配置")
+            return
+        if not isinstance(body, dict):
+            raise RequestError(["请求体必须是对象"])
+        wish = body.get("wish")
+        if not isinstance(wish, str) or not wish.strip():
+            raise RequestError(["wish 必须是非空字符串"])
+        profile, religion, race = parse_student(body, catalog)
+
+        client, scheduler, flights, advice_cache = get_ai(api_key)
+        cache_key = advice_key(profile.grades, profile.state, religion, race, profile.koko, wish,
+                               catalogue=catalog.version)
+        advice = advice_cache.get(cache_key)
+        telemetry.inc("spm_advice_cache_requests_total", help="Advice cache lookups", result="hit" if advice is not None else "miss")
+        cached = advice is not None
+        if not cached:
+            eligible = catalog.match(profile)
+            top = ranking.top_k(profile, eligible, catalog.rules, prompts.PROMPT_TOP_K)
+            prompt_text = prompts.build_ai_prompt(profile, religion, race, wish, top, total=len(eligible))
+            try:
+                advice = flights.do(
+                    ai_pool.prompt_key("ask", prompt_text),
+                    lambda: scheduler.call(lambda timeout: _ask(client, prompt_text, timeout)),
+                )
+            except Overloaded as e:
+                self._error(503, str(e), headers=[("Retry-After", "5")])
+                return
+            except DeadlineExceeded as e:
+                self._error(504, str(e))
+                return
+            except Exception as e:
+                telemetry.inc("spm_ai_errors_total", error=type(e).__name__)
+                self._error(502, f"DeepSeek 调用失败：{type(e).__name__}")
+                return
+            advice_cache.put(cache_key, advice)
+        self._send(200, json.dumps({"advice": advice, "cached": cached}, ensure_ascii=False))
+
+    ROUTES = {"/match": match, "/match/batch": match_batch, "/advice": advice}
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, store):
+        self.store = store
+        super().__init__(address, ApiHandler)
+
+
+# --- 5. pre-fork ---
+
+def serve(host="127.0.0.1", port=8600, workers=1, catalogue_path=CATALOGUE_PATH):
+    store = CatalogStore(catalogue_path)
+    catalog = store.current()
+    _summaries(catalog)  # fork 之前准备好，所有 worker 共享
+    if os.environ.get("DEEPSEEK_API_KEY"):
+        import openai  # noqa: F401  (ai_pool 按需导入；这里在 fork 之前导入，worker 不用各自花 0.6 秒)
+    server = ApiServer((host, port), store)
+    print(f"✅ http://{host}:{server.server_address[1]}  {workers} 个 worker，"
+          f"目录 {catalog.version} ({len(catalog.db)} 个条目)", flush=True)
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                server.serve_forever()
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            time.sleep(1.0)  # 避免启动即崩溃时疯狂重启
+            spawn()
+    server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SPM 奖学金匹配 JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600, help="0 表示随机端口")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker 进程数")
+    parser.add_argument("--catalogue", default=CATALOGUE_PATH, help="JSON 数据文件")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.catalogue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+静态资源流水线：CSS 压缩 + 指纹文件名，打赏图片缩放 + 重新压缩
+
+进程启动时执行一次 (app.py 用 st.cache_resource 缓存)，生成的文件写入 static/，
+由 Streamlit 的静态文件服务 (.streamlit/config.toml 中 enableStaticServing) 以 /app/static/ 提供。
+文件名带内容哈希，浏览器可以长期缓存；每次重跑只需要发送一个 <link> / <img> 标签，
+不再重复推送 100 行 CSS 和 83 KB 的图片。
+"""
+import hashlib
+import os
+import re
+import shutil
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSS_SOURCE = os.path.join(BASE_DIR, "assets", "style.css")
+DONATE_IMAGE = os.path.join(BASE_DIR, "tng.jpeg")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_URL = "app/static"
+
+# 侧边栏 450px，按 1x / 2x 屏幕各出一个版本
+IMAGE_WIDTHS = (450, 900)
+JPEG_QUALITY = 72
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _write_once(path, data):
+    """内容哈希已在文件名里，文件存在就不用再写"""
+    if not os.path.exists(path):
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+def build_css(static_dir=STATIC_DIR):
+    with open(CSS_SOURCE, encoding="utf-8") as f:
+        css = minify_css(f.read())
+    data = css.encode("utf-8")
+    name = f"style.{_fingerprint(data)}.css"
+    _write_once(os.path.join(static_dir, name), data)
+    return name, css
+
+
+def build_images(static_dir=STATIC_DIR):
+    """返回 {宽度: 文件名}；没有 Pillow 时直接复制原图"""
+    if not os.path.exists(DONATE_IMAGE):
+        return {}
+    with open(DONATE_IMAGE, "rb") as f:
+        raw = f.read()
+    digest = _fingerprint(raw)
+    try:
+        from PIL import Image
+    except ImportError:
+        name = f"tng.{digest}.jpeg"
+        dest = os.path.join(static_dir, name)
+        if not os.path.exists(dest):
+            shutil.copyfile(DONATE_IMAGE, dest)
+        return {0: name}
+
+    variants = {}
+    # Image.open 只读文件头；所有尺寸都已生成时不解码 (冷启动时省掉十几毫秒)
+    with Image.open(DONATE_IMAGE) as im:
+        rgb = None
+        for width in IMAGE_WIDTHS:
+            name = f"tng.{digest}.{width}.jpeg"
+            dest = os.path.join(static_dir, name)
+            if not os.path.exists(dest):
+                rgb = rgb or im.convert("RGB")
+                height = round(rgb.height * width / rgb.width)
+                resized = rgb.resize((width, height), Image.LANCZOS) if width < rgb.width else rgb
+                tmp = f"{dest}.tmp{os.getpid()}"
+                resized.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                os.replace(tmp, dest)
+            variants[width] = name
+    return variants
+
+
+def build_assets(static_dir=STATIC_DIR):
+    """生成所有静态资源，返回清单"""
+    os.makedirs(static_dir, exist_ok=True)
+    css_file, css_inline = build_css(static_dir)
+    images = build_images(static_dir)
+    return {"css_file": css_file, "css_inline": css_inline, "donate_images": images}
+
+
+def css_tag(manifest, static_serving):
+    """开启静态服务时只发 <link>，否则退回内联压缩后的 <style>"""
+    if static_serving:
+        return f'<link rel="stylesheet" href="{STATIC_URL}/{manifest["css_file"]}">'
+    return f"<style>{manifest['css_inline']}</style>"
+
+
+def donate_image_tag(manifest, caption):
+    images = manifest["donate_images"]
+    if not images:
+        return ""
+    ordered = sorted(images.items())
+    srcset = ", ".join(f"{STATIC_URL}/{name} {w}w" for w, name in ordered if w)
+    src = f"{STATIC_URL}/{ordered[0][1]}"
+    srcset_attr = f' srcset="{srcset}" sizes="(max-width: 600px) 100vw, 450px"' if srcset else ""
+    return (
+        f'<figure style="margin:0;"><img src="{src}"{srcset_attr} alt="{caption}" '
+        f'loading="lazy" style="width:100%; border-radius:8px;">'
+        f'<figcaption style="text-align:center; font-size:14px; color:#6B7280;">{caption}</figcaption></figure>'
+    )
+
+
+if __name__ == "__main__":
+    manifest = build_assets()
+    print(f"CSS: {manifest['css_file']} ({len(manifest['css_inline'])} bytes)")
+    for width, name in sorted(manifest["donate_images"].items()):
+        size = os.path.getsize(os.path.join(STATIC_DIR, name))
+        print(f"图片 {width}px: {name} ({size:,} bytes)")
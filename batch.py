@@ -0,0 +1,87 @@
+"""
+批量资格判定 (pandas / NumPy)
+
+输入一个学生 DataFrame：SUBJECT_LIST 中每个科目一列 (序数成绩，0 = 未考)，
+外加 state / bumi / muslim / koko 四列。输出 学生 × 奖学金 的布尔矩阵。
+每个奖学金只做一次整列比较，不逐行跑 Python。
+"""
+import numpy as np
+import pandas as pd
+
+import engine
+from scholarship_data import SUBJECT_LIST
+
+PROFILE_COLUMNS = ["state", "bumi", "muslim", "koko"]
+SUBJECT_INDEX = {sub: i for i, sub in enumerate(SUBJECT_LIST)}
+
+# 字符串形式的身份栏位也接受 (例如直接从学校的 CSV 导入)
+_TRUE_STRINGS = {"1", "true", "t", "yes", "y", "bumiputera", "bumi", "islam", "muslim"}
+
+
+def _as_bool(col):
+    if col.dtype == bool:
+        return col.to_numpy()
+    if pd.api.types.is_numeric_dtype(col):
+        return col.fillna(0).to_numpy() != 0
+    return col.astype(str).str.strip().str.lower().isin(_TRUE_STRINGS).to_numpy()
+
+
+def encode_grades(df):
+    """把 "A+" / "B" 这类等级字符串转换成序数列 (未考或空白 = 0)"""
+    out = df.copy()
+    for sub in SUBJECT_LIST:
+        if sub not in out.columns:
+            out[sub] = engine.RANK_NONE
+            continue
+        col = out[sub]
+        if not pd.api.types.is_numeric_dtype(col):
+            col = col.astype(str).str.strip().map(engine.GRADE_RANK)
+        out[sub] = col.fillna(engine.RANK_NONE).astype(np.int8)
+    return out
+
+
+def eligibility_matrix(df, rules=engine.RULES):
+    """返回 DataFrame[bool]，index 与输入相同，每个奖学金一列"""
+    n = len(df)
+    G = np.zeros((n, len(SUBJECT_LIST)), dtype=np.int8)
+    for j, sub in enumerate(SUBJECT_LIST):
+        if sub in df.columns:
+            G[:, j] = df[sub].fillna(engine.RANK_NONE).to_numpy(dtype=np.int8)
+
+    # 成绩统计：一次算完所有学生
+    count_A_plus = (G == engine.RANK_A_PLUS).sum(axis=1)
+    count_A_strict = (G >= engine.RANK_A).sum(axis=1)
+    count_A_loose = (G >= engine.RANK_A_MINUS).sum(axis=1)
+    all_A_minus = ~((G > engine.RANK_NONE) & (G < engine.RANK_A_MINUS)).any(axis=1)
+
+    state = df["state"].astype(str).to_numpy()
+    is_bumi = _as_bool(df["bumi"])
+    is_muslim = _as_bool(df["muslim"])
+    koko = pd.to_numeric(df["koko"], errors="coerce").fillna(0.0).to_numpy()
+
+    M = np.ones((n, len(rules)), dtype=bool)
+    for k, rule in enumerate(rules):
+        ok = M[:, k]
+        if rule.state_req is not None: ok &= state == rule.state_req
+        if rule.muslim_req: ok &= is_muslim
+        if rule.bumi_req: ok &= is_bumi
+        if rule.koko_marks > 0: ok &= koko >= rule.koko_marks
+        if rule.min_A_plus > 0: ok &= count_A_plus >= rule.min_A_plus
+        if rule.min_A_total > 0:
+            ok &= (count_A_loose if rule.count_A_minus else count_A_strict) >= rule.min_A_total
+        if rule.must_all_A_minus: ok &= all_A_minus
+        for sub, lowest, holes in rule.hard_req:
+            if sub not in SUBJECT_INDEX:
+                ok[:] = False
+                continue
+            col = G[:, SUBJECT_INDEX[sub]]
+            ok &= col >= lowest
+            if holes: ok &= ~np.isin(col, list(holes))
+
+    return pd.DataFrame(M, index=df.index, columns=[rule.name for rule in rules])
+
+
+def eligible_names(matrix):
+    """把布尔矩阵转回每个学生的奖学金名单"""
+    names = np.asarray(matrix.columns)
+    return [list(names[row]) for row in matrix.to_numpy()]
@@ -0,0 +1 @@
+"""性能基准测试与压测工具 (在仓库根目录用 python -m benchmarks.<name> 运行)"""
@@ -0,0 +1,149 @@
+"""
+api_server.py 本地压测：启动 pre-fork 服务器，用多线程 keep-alive 客户端打各个端点，报告 p50 / p99
+
+    python -m benchmarks.api_load                               # 4 个 worker，/match + /match/batch
+    python -m benchmarks.api_load --workers 8 --concurrency 64
+    python -m benchmarks.api_load --advice 200                  # 另测 /advice (指向 fake_deepseek.py)
+
+客户端和服务器在同一台机器上，客户端线程也占 CPU；worker 数接近核数时吞吐量会受客户端限制。
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench import ROOT, summarize
+from benchmarks.synth import synth_students
+
+SERVER_PATH = os.path.join(ROOT, "api_server.py")
+
+
+def start_server(workers, env=None):
+    """启动服务器子进程 (随机端口)，返回 (进程, 端口)"""
+    proc = subprocess.Popen(
+        [sys.executable, SERVER_PATH, "--port", "0", "--workers", str(workers)],
+        stdout=subprocess.PIPE, text=True, env={**os.environ, **(env or {})},
+    )
+    line = proc.stdout.readline()
+    found = re.search(r":(\d+)\s", line)
+    if not found:
+        proc.kill()
+        raise RuntimeError(f"服务器启动失败：{line!r}")
+    port = int(found.group(1))
+    # 等所有 worker 都在 accept
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/healthz")
+            if conn.getresponse().status == 200:
+                break
+        except OSError:
+            time.sleep(0.05)
+    return proc, port
+
+
+def run_load(port, path, bodies, concurrency):
+    """concurrency 个线程各自保持一个连接，把 bodies 平均分掉；返回 (延迟列表, 错误数, 总耗时)"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        mine, failed = [], 0
+        for body in chunk:
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", path, body, {"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            mine.append(time.perf_counter() - t0)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, args=(bodies[i::concurrency],)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, sum(errors), time.perf_counter() - t0
+
+
+def _report(name, latencies, errors, elapsed, per_request=1):
+    r = summarize(latencies)
+    r.update(errors=errors, rps=len(latencies) / elapsed, students_per_s=len(latencies) * per_request / elapsed)
+    print(f"{name:<14} n={r['n']:<6} p50={r['p50_ms']:8.3f} ms  p99={r['p99_ms']:8.3f} ms  "
+          f"{r['rps']:8.0f} req/s  {r['students_per_s']:9.0f} 学生/s  错误 {errors}")
+    return r
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="api_server.py 本地压测")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32, help="客户端并发连接数")
+    parser.add_argument("--requests", type=int, default=20000, help="/match 请求数")
+    parser.add_argument("--batch-requests", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--advice", type=int, default=0, help="/advice 请求数 (0 表示不测)")
+    parser.add_argument("--ai-latency", type=float, default=0.2, help="fake DeepSeek 响应延迟 (秒)")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("-o", "--output", help="结果 JSON 路径")
+    args = parser.parse_args(argv)
+
+    students = synth_students(max(args.requests, args.batch_size, args.advice), args.seed)
+    for s in students:
+        s.pop("wish")
+    env = {}
+    fake = None
+    if args.advice:
+        from fake_deepseek import start_fake_server
+        fake = start_fake_server(latency=args.ai_latency)
+        env = {"DEEPSEEK_API_KEY": "fake", "DEEPSEEK_BASE_URL": fake.url,
+               "SPM_ADVICE_CACHE": os.path.join(tempfile.mkdtemp(), "advice.sqlite3")}
+
+    proc, port = start_server(args.workers, env)
+    results = {"workers": args.workers, "concurrency": args.concurrency}
+    try:
+        # 预热连接与各 worker 的匹配缓存，不计入结果
+        run_load(port, "/match", [json.dumps(s) for s in students[:args.concurrency * 4]], args.concurrency)
+
+        bodies = [json.dumps(s) for s in students[:args.requests]]
+        results["match"] = _report("/match", *run_load(port, "/match", bodies, args.concurrency))
+
+        batches = [json.dumps({"students": students[(i * args.batch_size) % len(students):][:args.batch_size]})
+                   for i in range(args.batch_requests)]
+        results["match_batch"] = _report("/match/batch", *run_load(port, "/match/batch", batches, args.concurrency),
+                                         per_request=args.batch_size)
+
+        if args.advice:
+            wishes = ["我想读 Computer Science", "我想当医生", "想读会计", "想去日本读工程"]
+            bodies = [json.dumps({**s, "wish": wishes[i % len(wishes)]}) for i, s in enumerate(students[:args.advice])]
+            results["advice"] = _report("/advice", *run_load(port, "/advice", bodies, args.concurrency))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        if fake is not None:
+            fake.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+基准测试：匹配逻辑、Prompt 构建、整页无头重跑
+
+    python -m benchmarks.bench                    # 全部
+    python -m benchmarks.bench --skip-app         # 只测纯 Python 部分
+    python -m benchmarks.bench -o before.json     # 指定输出文件
+
+整页重跑用 streamlit.testing 的 AppTest 在本进程内执行 app.py，
+AI 调用指向 fake_deepseek.py (零延迟)，所以测到的是我们自己的开销。
+结果写成 JSON，不同版本之间可以直接对比。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def summarize(samples):
+    """样本单位为秒，输出毫秒"""
+    data = sorted(samples)
+    n = len(data)
+    if not n:
+        return {"n": 0}
+    pick = lambda q: data[min(n - 1, int(q * n))] * 1000
+    return {
+        "n": n,
+        "mean_ms": sum(data) / n * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "min_ms": data[0] * 1000,
+        "max_ms": data[-1] * 1000,
+    }
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+# --- 1. 纯 Python 部分 ---
+
+def bench_matching(students):
+    import engine
+    from cache import MatchMemo
+    from benchmarks.synth import to_profile
+
+    profiles = [to_profile(s) for s in students]
+    memo = MatchMemo(engine.RULES, min_rules=0)  # 小目录上 app 不用缓存，这里照样测它
+    memoized = summarize([timed(memo.match, p) for p in profiles])
+    memoized["hit_rate"] = memo.stats()["hit_rate"]
+    return {
+        "make_profile": summarize([timed(to_profile, s) for s in students]),
+        "match": summarize([timed(engine.match, p) for p in profiles]),
+        "match_memo": memoized,
+        "explain": summarize([timed(engine.explain, p) for p in profiles]),
+    }
+
+
+def bench_prompt(students):
+    import engine
+    import prompts
+    import ranking
+    from benchmarks.synth import to_profile
+
+    matched, cases = [], []
+    for s in students:
+        p = to_profile(s)
+        eligible = engine.match(p)
+        matched.append((p, eligible, engine.RULES, prompts.PROMPT_TOP_K))
+        top = ranking.top_k(p, eligible, k=prompts.PROMPT_TOP_K)
+        cases.append((p, s["religion"], s["race"], s["wish"], top, prompts.INPUT_TOKEN_BUDGET, len(eligible)))
+    return {
+        "rank_top_k": summarize([timed(ranking.top_k, *m) for m in matched]),
+        "build_ai_prompt": summarize([timed(prompts.build_ai_prompt, *c) for c in cases]),
+    }
+
+
+def bench_batch(students, repeats):
+    import batch
+    from benchmarks.synth import to_frame
+
+    df = to_frame(students)
+    samples = [timed(batch.eligibility_matrix, df) for _ in range(repeats)]
+    result = summarize(samples)
+    result["rows"] = len(df)
+    result["rows_per_sec"] = len(df) / (sum(samples) / len(samples))
+    return {"eligibility_matrix": result}
+
+
+def bench_catalog_db(students, catalogue_size):
+    """SQLite 目录：catalogue_size 个条目上的索引查询 (带 / 不带过滤)"""
+    import engine
+    from benchmarks.synth import synth_catalogue, to_profile
+    from catalog_db import CatalogDB
+    from scholarship_data import parse_catalogue, STATE_LIST, SUBJECT_LIST
+
+    _, _, db = parse_catalogue({"states": STATE_LIST, "subjects": SUBJECT_LIST,
+                                "scholarships": synth_catalogue(catalogue_size)})
+    store = CatalogDB()
+    store.load(db)
+    rules = engine.compile_rules(db)
+    profiles = [to_profile(s) for s in students]
+    return {
+        "catalog_db_eligible": dict(summarize([timed(store.eligible_ids, p) for p in profiles]),
+                                    entries=catalogue_size),
+        "catalog_db_filtered": summarize([timed(store.eligible_ids, p, None, "engineering", ("工程系",))
+                                          for p in profiles]),
+        "engine_match_large": summarize([timed(engine.match, p, rules) for p in profiles]),
+    }
+
+
+# --- 2. 整页无头重跑 ---
+
+def bench_app(students, iterations):
+    from streamlit.testing.v1 import AppTest
+
+    load, grade_change, analyze = [], [], []
+    for i, s in enumerate(students[:iterations]):
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.secrets["DEEPSEEK_API_KEY"] = "bench"
+        load.append(timed(at.run))
+
+        grade_box = next(sb for sb in at.selectbox if sb.key and sb.key.startswith("grade_"))
+        grade_box.set_value("B" if grade_box.value != "B" else "A")
+        grade_change.append(timed(at.run))
+
+        # 每次用不同的愿望，避免命中建议缓存，测的是完整的分析路径
+        at.text_input[0].input(f"{s['wish'] or '随便看看'} #{i}")
+        next(b for b in at.button if "Analyze" in b.label).click()
+        analyze.append(timed(at.run))
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    return {
+        "app_initial_load": summarize(load),
+        "app_grade_change": summarize(grade_change),
+        "app_analyze_click": summarize(analyze),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SPM Scholarship Check 基准测试")
+    parser.add_argument("-n", "--profiles", type=int, default=5000, help="合成考生数量")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--batch-rows", type=int, default=20000)
+    parser.add_argument("--batch-repeats", type=int, default=5)
+    parser.add_argument("--catalogue-size", type=int, default=10000, help="SQLite 目录基准的条目数")
+    parser.add_argument("--app-iterations", type=int, default=20)
+    parser.add_argument("--skip-app", action="store_true", help="不跑整页重跑 (不需要 streamlit)")
+    parser.add_argument("-o", "--output", help="输出 JSON 路径")
+    args = parser.parse_args(argv)
+
+    # AI 与缓存都指向临时资源 (必须在导入 app 相关模块之前设置)
+    tmp = tempfile.mkdtemp(prefix="spm-bench-")
+    os.environ["SPM_ADVICE_CACHE"] = os.path.join(tmp, "advice.sqlite3")
+    fake = None
+    if not args.skip_app:
+        from fake_deepseek import start_fake_server
+        fake = start_fake_server(latency=0.0, token_delay=0.0)
+        os.environ["DEEPSEEK_BASE_URL"] = fake.url
+
+    import engine
+    from benchmarks.synth import synth_students
+
+    students = synth_students(max(args.profiles, args.batch_rows, args.app_iterations), args.seed)
+    results = {}
+    results.update(bench_matching(students[:args.profiles]))
+    results.update(bench_prompt(students[:args.profiles]))
+    results.update(bench_batch(students[:args.batch_rows], args.batch_repeats))
+    results.update(bench_catalog_db(students[:min(args.profiles, 2000)], args.catalogue_size))
+    if not args.skip_app:
+        results.update(bench_app(students, args.app_iterations))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "catalogue_size": len(engine.RULES),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, r in results.items():
+        if r.get("n"):
+            print(f"{name:<22} n={r['n']:<6} p50={r['p50_ms']:9.3f} ms  p95={r['p95_ms']:9.3f} ms")
+    print(f"\n📄 结果已写入 {output}")
+    if fake is not None:
+        fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
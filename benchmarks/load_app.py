@@ -0,0 +1,247 @@
+"""
+app.py 多会话压测：同一进程里并发跑很多个无头会话 (streamlit.testing 的 AppTest)，在放榜日之前找出容量上限
+
+每个会话按真实顺序操作：打开页面 → 按学生成绩改两个等级 → 添加一行并选科目 / 等级 → 删除一行
+→ 输入愿望并点击“🚀 立即分析” (一直计到后台 AI 任务结束、结果显示出来)。AI 指向 fake_deepseek.py，延迟、逐字延迟和错误率可调。
+所有会话共享同一个进程的 st.cache_resource (目录、连接池、调度器、建议缓存)，
+与生产环境里一个 Streamlit 服务器进程的情况相同。
+
+    python -m benchmarks.load_app --sessions 200 --concurrency 16
+    python -m benchmarks.load_app --sessions 300 --ai-latency 1.5 --error-rate 0.05
+    python -m benchmarks.load_app --ramp 4,8,16,32 --sessions 100    # 逐级加压，看 p99 从哪一级开始失控
+
+报告：吞吐量 (会话/秒、重跑/秒)、每种操作和全部重跑的 p50 / p95 / p99、错误数、
+每个会话的内存 (session_state 估算值，以及所有会话保留到结束时的 RSS 增量)。
+
+限制：AppTest 每次交互都重跑整个脚本 (不支持只重跑 fragment)，也不经过 websocket 和浏览器，
+所以表格操作的延迟偏高、网络开销不计；RSS 增量包含 AppTest 自身的元素树，是上限。
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench import APP_PATH, summarize
+from benchmarks.synth import synth_students
+
+STEPS = ("load", "grid_edit", "add_row", "delete_row", "analyze")
+AI_ERROR_MARK = "AI 连接失败"
+
+
+class SessionError(RuntimeError):
+    """脚本运行出现异常 (不包括 AI 失败，AI 失败按页面上的提示计数)"""
+
+
+def rss_bytes():
+    """当前常驻内存；没有 /proc 时退回到峰值 RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def share_app_test_globals(api_key):
+    """AppTest 是为单线程测试设计的：每次运行都会替换、然后清空 Runtime 单例和 st.secrets，
+    并且每次都重新解析 app.py。压测里多个会话同时运行，所以把这些进程级全局量固定下来，
+    避免一个会话结束时清掉另一个会话正在用的；脚本字节码像真正的服务器一样只编译一次
+    (Python 3.11 的 ast.parse 在多线程下同时调用还会出错)"""
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script_cache = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    config.set_option("global.appTest", True)
+    secrets = Secrets()
+    secrets._secrets = {"DEEPSEEK_API_KEY": api_key}
+    st.secrets = secrets
+
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        runtime = cls._instance or last.get("runtime")
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in last)
+
+
+def wait_for_ai(at, timeout=120):
+    """AI 在后台任务里进行 (见 ai_tasks.py)，页面靠 run_every fragment 轮询；AppTest 不执行定时 fragment，
+    所以等任务结束后模拟轮询 fragment 触发的那次整页重跑"""
+    tasks = at.session_state["ai_tasks"] if "ai_tasks" in at.session_state else None
+    task = tasks.current if tasks is not None else None
+    if task is not None and not task.done:
+        task.wait(timeout)
+        at.session_state["ai_finished"] = True
+        at.run()
+
+
+def run_session(student, n, samples):
+    """一个会话的完整操作序列；samples[操作] 收集每次重跑的耗时。返回 (AppTest, 是否 AI 失败)"""
+    from streamlit.testing.v1 import AppTest
+
+    # API key 由 share_app_test_globals() 放进全局 st.secrets；这里不设 at.secrets，AppTest 就不会去替换它
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+
+    def step(name, action):
+        t0 = time.perf_counter()
+        action()
+        samples[name].append(time.perf_counter() - t0)
+        if at.exception:
+            raise SessionError(f"{name}: {at.exception[0].message}")
+
+    step("load", at.run)
+    rows = at.session_state["rows"]
+    preset = {subject: row_id for row_id, subject, _ in rows}
+
+    # 默认的几行改成这个学生的等级
+    edits = [(preset[sub], g) for sub, g in student["grades"].items() if sub in preset][:2]
+    for row_id, grade in edits:
+        step("grid_edit", lambda: at.selectbox(key=f"grade_{row_id}").set_value(grade).run())
+
+    # 添加一个默认行里没有的科目
+    extra = next(((s, g) for s, g in student["grades"].items() if s not in preset), None)
+    if extra is not None:
+        step("add_row", lambda: next(b for b in at.button if "Add" in b.label).click().run())
+        new_id = at.session_state["rows"].ids[-1]
+        step("grid_edit", lambda: at.selectbox(key=f"sub_{new_id}").set_value(extra[0]).run())
+        step("grid_edit", lambda: at.selectbox(key=f"grade_{new_id}").set_value(extra[1]).run())
+
+    # 删掉学生没考的默认科目 (例如穆斯林学生的 Pendidikan Moral)
+    missing = [row_id for sub, row_id in preset.items() if sub not in student["grades"]]
+    if missing:
+        step("delete_row", lambda: at.button(key=f"del_{missing[0]}").click().run())
+
+    at.text_input[0].input(f"{student['wish'] or '随便看看'} #{n}")
+    step("analyze", lambda: (next(b for b in at.button if "Analyze" in b.label).click().run(), wait_for_ai(at)))
+    ai_failed = any(AI_ERROR_MARK in m.value for m in at.markdown)
+    return at, ai_failed
+
+
+def run_stage(students, concurrency):
+    """concurrency 个会话同时进行，直到跑完 students；所有会话保留到结束，用来测内存"""
+    import session_rows
+
+    samples = defaultdict(list)
+    errors, ai_errors, kept = [], 0, []
+    rss_before = rss_bytes()
+
+    def one(args):
+        n, student = args
+        try:
+            return run_session(student, n, samples)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return None, False
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+        for at, ai_failed in pool.map(one, enumerate(students)):
+            ai_errors += ai_failed
+            if at is not None:
+                kept.append(at)
+    elapsed = time.perf_counter() - t0
+    rss_after = rss_bytes()
+
+    state_sizes = [
+        session_rows.session_memory(at.session_state, at.session_state["rows"].subjects)["total_bytes"]
+        for at in kept
+    ]
+    reruns = sum(len(v) for v in samples.values())
+    result = {
+        "concurrency": concurrency,
+        "sessions": len(students),
+        "completed": len(kept),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "ai_errors": ai_errors,
+        "elapsed_s": elapsed,
+        "sessions_per_s": len(kept) / elapsed,
+        "reruns_per_s": reruns / elapsed,
+        "all_reruns": summarize([x for v in samples.values() for x in v]),
+        "steps": {name: summarize(samples[name]) for name in STEPS if samples[name]},
+        "session_state_bytes": sum(state_sizes) / len(state_sizes) if state_sizes else 0,
+        "rss_per_session_bytes": (rss_after - rss_before) / len(kept) if kept else 0,
+    }
+    del kept
+    return result
+
+
+def _print_stage(r, p99_limit_ms):
+    a = r["all_reruns"]
+    over = r["steps"].get("analyze", {}).get("p99_ms", 0) > p99_limit_ms
+    print(f"\n=== 并发 {r['concurrency']}：{r['completed']}/{r['sessions']} 个会话，"
+          f"{r['sessions_per_s']:.2f} 会话/s，{r['reruns_per_s']:.1f} 重跑/s，"
+          f"脚本错误 {r['errors']}，AI 失败 {r['ai_errors']} {'❌ 超过 p99 上限' if over else ''}")
+    print(f"{'all':<11} n={a['n']:<5} p50={a['p50_ms']:9.1f} ms  p95={a['p95_ms']:9.1f} ms  p99={a['p99_ms']:9.1f} ms")
+    for name, s in r["steps"].items():
+        print(f"{name:<11} n={s['n']:<5} p50={s['p50_ms']:9.1f} ms  p95={s['p95_ms']:9.1f} ms  p99={s['p99_ms']:9.1f} ms")
+    print(f"内存：session_state ≈ {r['session_state_bytes'] / 1024:.1f} KB/会话，"
+          f"RSS 增量 ≈ {r['rss_per_session_bytes'] / 1024:.0f} KB/会话 (含 AppTest 开销)")
+    for e in r["error_samples"]:
+        print(f"  ⚠️ {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="app.py 多会话压测")
+    parser.add_argument("--sessions", type=int, default=100, help="每一级的会话数")
+    parser.add_argument("--concurrency", type=int, default=16, help="同时进行的会话数")
+    parser.add_argument("--ramp", help="逐级加压的并发数列表，例如 4,8,16,32 (覆盖 --concurrency)")
+    parser.add_argument("--ai-latency", type=float, default=0.5, help="fake DeepSeek 首包延迟 (秒)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="流式输出每个字的延迟 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake DeepSeek 返回错误的比例 (0-1)")
+    parser.add_argument("--p99-limit-ms", type=float, default=3000.0, help="分析点击 p99 超过这个值时标记")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("-o", "--output", help="结果 JSON 路径")
+    args = parser.parse_args(argv)
+
+    # AI 与缓存都指向临时资源 (必须在 app 导入 ai_pool 之前设置)
+    from fake_deepseek import start_fake_server
+
+    fake = start_fake_server(latency=args.ai_latency, token_delay=args.token_delay,
+                             error_rate=args.error_rate, seed=args.seed)
+    os.environ["DEEPSEEK_BASE_URL"] = fake.url
+    os.environ["SPM_ADVICE_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="spm-load-"), "advice.sqlite3")
+    share_app_test_globals("load-test")
+
+    levels = [int(x) for x in args.ramp.split(",")] if args.ramp else [args.concurrency]
+    students = synth_students(args.sessions * (len(levels) + 1), args.seed)
+
+    # 冷启动 (目录编译、静态资源、连接池) 单独计时，不计入各级结果
+    t0 = time.perf_counter()
+    run_session(students[0], 0, defaultdict(list))
+    print(f"冷启动会话：{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    results = {"args": vars(args), "stages": []}
+    try:
+        for k, concurrency in enumerate(levels):
+            batch = students[(k + 1) * args.sessions:(k + 2) * args.sessions]
+            stage = run_stage(batch, concurrency)
+            stage["upstream"] = {"requests": fake.requests, "errors": fake.errors}
+            results["stages"].append(stage)
+            _print_stage(stage, args.p99_limit_ms)
+    finally:
+        fake.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+可复现的合成考生数据 (以及用于压测的大目录)
+
+按“能力值”生成较真实的成绩分布：大多数学生集中在 B/C，少数全 A。
+科目组合 = 必修 + 理科/文商科组合 + 可选语言；州属按人口比例；土著 / 穆斯林按大致比例混合。
+synth_catalogue() 以真实条目为模板生成上千个门槛各异的条目。
+"""
+import random
+
+import engine
+from scholarship_data import GRADE_OPTIONS, KINDS, SCHOLARSHIP_DB, STATE_LIST, SUBJECT_LIST
+
+GRADES = GRADE_OPTIONS[1:]  # A+ ... G
+
+CORE = ["Bahasa Melayu", "Bahasa Inggeris", "Sejarah", "Matematik"]
+SCIENCE_STREAM = ["Matematik Tambahan", "Fizik", "Kimia", "Biologi"]
+ARTS_STREAM = ["Prinsip Perakaunan", "Ekonomi", "Perniagaan", "Sains"]
+ELECTIVES = [s for s in SUBJECT_LIST if s not in CORE + SCIENCE_STREAM + ARTS_STREAM
+             and s not in ("Pendidikan Islam", "Pendidikan Moral")]
+
+# 大致按考生人数加权
+STATE_WEIGHTS = {
+    "Selangor": 16, "Johor": 11, "Sabah": 9, "Sarawak": 8, "Perak": 7, "Kedah": 6,
+    "Kelantan": 6, "W.P. Kuala Lumpur": 5, "Penang": 5, "Pahang": 5, "Terengganu": 4,
+    "Negeri Sembilan": 3, "Melaka": 3, "Perlis": 1, "W.P. Putrajaya": 1, "W.P. Labuan": 1,
+}
+
+WISHES = [
+    "我想读 Computer Science",
+    "我想当医生",
+    "不确定要选 Matriculation 还是 A-Level",
+    "家里经济不好，有什么奖学金？",
+    "想读会计",
+    "想去日本读工程",
+    "",
+]
+
+
+def _grade(rng, ability):
+    """能力值越高，越可能拿到高等级 (序数 1-10)"""
+    rank = round(rng.gauss(ability, 1.3))
+    rank = max(1, min(engine.RANK_A_PLUS, rank))
+    return GRADES[engine.RANK_A_PLUS - rank]
+
+
+def synth_student(rng):
+    is_bumi = rng.random() < 0.62
+    is_muslim = rng.random() < (0.9 if is_bumi else 0.05)
+    ability = rng.gauss(6.2, 1.8)
+
+    subjects = list(CORE)
+    subjects.append("Pendidikan Islam" if is_muslim else "Pendidikan Moral")
+    subjects += SCIENCE_STREAM if rng.random() < 0.45 else ARTS_STREAM[:rng.randint(2, 4)]
+    subjects += rng.sample(ELECTIVES, rng.randint(0, 2))
+
+    return {
+        "grades": {sub: _grade(rng, ability) for sub in subjects},
+        "state": rng.choices(list(STATE_WEIGHTS), weights=list(STATE_WEIGHTS.values()))[0],
+        "religion": "Islam" if is_muslim else "Non-Muslim",
+        "race": "Bumiputera" if is_bumi else "Non-Bumiputera",
+        "koko": round(min(10.0, max(0.0, rng.gauss(7.5, 1.2))), 2),
+        "wish": rng.choice(WISHES),
+    }
+
+
+def synth_students(n, seed=2024):
+    rng = random.Random(seed)
+    return [synth_student(rng) for _ in range(n)]
+
+
+def to_profile(student):
+    return engine.make_profile(
+        student["grades"], student["state"],
+        student["religion"] == "Islam", student["race"] == "Bumiputera", student["koko"],
+    )
+
+
+def to_frame(students):
+    """转换成 batch.eligibility_matrix 使用的 DataFrame (序数成绩列)"""
+    import pandas as pd
+
+    rows = []
+    for s in students:
+        row = {sub: engine.GRADE_RANK[g] for sub, g in s["grades"].items()}
+        row.update(state=s["state"], bumi=s["race"] == "Bumiputera",
+                   muslim=s["religion"] == "Islam", koko=s["koko"])
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    for sub in SUBJECT_LIST:
+        df[sub] = df[sub].fillna(0).astype("int8") if sub in df else 0
+    return df
+
+
+FIELDS = ["工程 (Engineering)", "医学 (Medicine)", "会计 (Accounting)", "法律 (Law)",
+          "计算机 (Computer Science)", "教育 (Education)", "农业 (Agriculture)"]
+
+
+def synth_catalogue(n, seed=2024):
+    """以真实条目为模板，随机化门槛 / 州属 / 身份 / 逐科要求，生成 n 个可通过校验的条目"""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        base = rng.choice(SCHOLARSHIP_DB)
+        min_A_total = rng.randint(0, 10)
+        hard_req = {}
+        for sub in rng.sample(CORE + SCIENCE_STREAM, rng.choice([0, 0, 1, 2, 3])):
+            hard_req[sub] = GRADES[:rng.randint(1, 6)]
+        sch = {
+            "name": f"{base['name']} #{i}",
+            "provider": f"{base['provider']} {i % 200}",
+            "kind": rng.choice(KINDS),
+            "tags": rng.sample(["全额资助", "B40优先", "工程系", "私立大学", "土著限定", "海外", "TVET"], 2),
+            "min_A_total": min_A_total,
+            "allow_A_minus": rng.random() < 0.5,
+            "min_A_plus": rng.randint(0, min_A_total),
+            "hard_req": hard_req,
+            "must_all_A_minus": rng.random() < 0.05,
+            "koko_marks": rng.choice([0, 4.0, 5.0, 6.0, 7.0, 8.0, 8.5, 9.0]),
+            "state_req": "All" if rng.random() < 0.6 else rng.choice(STATE_LIST),
+            "muslim_req": rng.random() < 0.1,
+            "bumi_req": rng.random() < 0.2,
+            "desc": base["desc"],
+            "link": base.get("link", ""),
+        }
+        roll = rng.random()
+        if roll < 0.2:
+            sch["field_only"] = rng.choice(FIELDS)
+        elif roll < 0.3:
+            sch["field_block"] = rng.choice(FIELDS)
+        out.append(sch)
+    return out
@@ -0,0 +1,204 @@
+"""
+冷启动：新副本在接流量之前，把每个进程只需要做一次的工作做完 (不依赖 Streamlit 脚本运行)
+
+- prewarm()：导入 app.py 用到的模块、编译奖学金目录、预渲染所有卡片、生成静态资源
+- open_ai_pool(api_key)：后台线程导入 openai、创建连接池，并预先建立一条 keep-alive 连接；
+  学生第一次点“分析”时直接拿现成的客户端 (还没准备好就等它)
+- 进程级对象 (目录、静态资源清单、AI 客户端) 放在这里，app.py 的 st.cache_resource 直接返回它们，
+  所以启动时预热的结果会被第一个会话复用
+
+    python boot.py [streamlit run 的参数...]     # 预热后在同一进程里启动 Streamlit 服务器
+    python boot.py --report                      # 冷启动报告：导入耗时、预热耗时、第一次请求耗时
+    python boot.py --report --no-prewarm         # 对照：不预热时第一个用户等多久
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+
+# app.py 每次运行都会用到的模块 (openai 不在其中：第一次调用 AI 时才需要)
+APP_MODULES = (
+    "streamlit", "streamlit.components.v1", "scholarship_data", "engine", "cache", "catalog",
+    "render", "whatif", "pathways", "ranking", "prompts", "session_rows", "telemetry", "assets", "ai_scheduler", "ai_pool", "ai_tasks",
+)
+
+_lock = threading.Lock()
+_resources = {}
+_ai_clients = {}
+TIMINGS = {}  # 阶段 -> 秒，导出为 spm_boot_seconds
+AI_POOL_WAIT = 10.0
+
+
+def _resource(name, factory):
+    with _lock:
+        if name not in _resources:
+            _resources[name] = factory()
+        return _resources[name]
+
+
+def _timed(phase, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    TIMINGS[phase] = time.perf_counter() - started
+    return result
+
+
+# --- 1. 进程级对象 ---
+
+def catalog_store():
+    from catalog import CatalogStore
+
+    return _resource("catalog_store", CatalogStore)
+
+
+def asset_manifest():
+    import assets
+
+    return _resource("assets", assets.build_assets)
+
+
+def open_ai_pool(api_key):
+    """在后台创建 DeepSeek 客户端 (每个 key 只创建一次)；返回 Future"""
+    with _lock:
+        future = _ai_clients.get(api_key)
+        if future is None:
+            future = _ai_clients[api_key] = Future()
+            threading.Thread(target=_open_ai_pool, args=(api_key, future), daemon=True, name="ai-pool-open").start()
+        return future
+
+
+def _open_ai_pool(api_key, future):
+    started = time.perf_counter()
+    try:
+        import ai_pool
+
+        client = ai_pool.make_client(api_key)
+    except Exception as e:
+        # 失败的 Future 不留在表里，下一次 open_ai_pool 会重新创建
+        with _lock:
+            if _ai_clients.get(api_key) is future:
+                del _ai_clients[api_key]
+        future.set_exception(e)
+        return
+    TIMINGS["ai_client"] = time.perf_counter() - started
+    future.set_result(client)
+    # 先握手一次，连接留在池里；失败无所谓，第一次真正的请求会自己连
+    try:
+        client.with_options(timeout=5.0).models.list()
+    except Exception:
+        pass
+    TIMINGS["ai_preconnect"] = time.perf_counter() - started
+
+
+def ai_client(api_key, timeout=30.0):
+    """拿到客户端；后台还没创建好时等待"""
+    return open_ai_pool(api_key).result(timeout=timeout)
+
+
+# --- 2. 预热 ---
+
+def prewarm(api_key=None, ai_wait=AI_POOL_WAIT):
+    """导入模块、编译目录、预渲染卡片、生成静态资源；有 api_key 时同时打开 AI 连接池，
+    最多等 ai_wait 秒 (单核机器上后台导入 openai 会和第一个请求抢 CPU，所以接流量之前等它完成)"""
+    started = time.perf_counter()
+    if api_key:
+        future = open_ai_pool(api_key)
+    _timed("imports", lambda: [importlib.import_module(name) for name in APP_MODULES])
+    import render
+
+    catalog = _timed("catalog", lambda: catalog_store().current())
+    _timed("cards", render.prerender, catalog.db)
+    _timed("assets", asset_manifest)
+    if api_key:
+        try:
+            future.result(timeout=ai_wait)
+        except Exception:  # 打不开也不影响启动；第一次调用 AI 时会再报错
+            pass
+    TIMINGS["total"] = time.perf_counter() - started
+    return dict(TIMINGS)
+
+
+def _secret_api_key():
+    key = os.environ.get("DEEPSEEK_API_KEY")
+    if key:
+        return key
+    try:
+        import streamlit as st
+
+        return st.secrets.get("DEEPSEEK_API_KEY")
+    except FileNotFoundError:  # 没有 secrets.toml
+        return None
+
+
+# --- 3. 冷启动报告 ---
+
+def report(prewarm_first=True):
+    """在一个全新的进程里运行：导入耗时、预热耗时、第一次打开页面 / 第一次分析的耗时"""
+    import tempfile
+
+    ms = lambda s: f"{s * 1000:8.1f} ms"
+    started = time.perf_counter()
+    import streamlit  # noqa: F401  (Streamlit 服务器本身必须导入，单独计)
+    print(f"{'import streamlit':<28}{ms(time.perf_counter() - started)}")
+
+    from fake_deepseek import start_fake_server
+
+    fake = start_fake_server(latency=0.0)
+    os.environ["DEEPSEEK_BASE_URL"] = fake.url
+    os.environ["SPM_ADVICE_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="spm-boot-"), "advice.sqlite3")
+    api_key = "boot-report"
+    if prewarm_first:
+        for name in APP_MODULES[1:]:
+            t0 = time.perf_counter()
+            importlib.import_module(name)
+            print(f"{'import ' + name:<28}{ms(time.perf_counter() - t0)}")
+        for phase, s in prewarm(api_key).items():
+            print(f"{'prewarm ' + phase:<28}{ms(s)}")
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["DEEPSEEK_API_KEY"] = api_key
+    for label in ("第一次打开页面", "第二次打开页面"):
+        t0 = time.perf_counter()
+        at.run()
+        print(f"{label:<22}{ms(time.perf_counter() - t0)}")
+    at.text_input[0].input("冷启动测试")
+    t0 = time.perf_counter()
+    next(b for b in at.button if "Analyze" in b.label).click().run()
+    print(f"{'第一次分析 (本地结果)':<22}{ms(time.perf_counter() - t0)}")
+    # AI 在后台任务里 (见 ai_tasks.py)；AppTest 不执行定时 fragment，等任务结束后手动整页重跑一次
+    task = at.session_state["ai_tasks"].current
+    task.wait(60)
+    at.session_state["ai_finished"] = True
+    at.run()
+    print(f"{'第一次分析 (含 AI)':<22}{ms(time.perf_counter() - t0)}")
+    fake.shutdown()
+
+    for phase in ("ai_preconnect",):
+        if phase in TIMINGS:
+            print(f"{'后台 ' + phase:<28}{ms(TIMINGS[phase])}")
+    print(f"pandas 已导入：{'pandas' in sys.modules}")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if "--report" in argv:
+        report(prewarm_first="--no-prewarm" not in argv)
+        return
+    timings = prewarm(_secret_api_key())
+    print("✅ 预热完成：" + "，".join(f"{k} {v * 1000:.0f} ms" for k, v in timings.items()), flush=True)
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", APP_PATH, *argv]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
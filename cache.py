@@ -0,0 +1,206 @@
+"""
+DeepSeek 建议缓存：进程内 LRU + SQLite 磁盘层
+
+同一个学生连按两次分析、或成千上万个成绩相同、愿望相同的学生，都只需要调用一次 AI。
+缓存键不是原始 ai_prompt，而是把 prompt 的组成部分规范化后的哈希：
+排序后的成绩、州属、宗教/种族、Koko 分段、规范化后的 student_wish，再加上目录版本
+(目录热更新后，旧建议里提到的奖学金可能已经不符合资格，不能再用)。
+
+MatchMemo 用同样的 LRU 缓存匹配结果，键是 RuleIndex.profile_key() 压缩后的资料。
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import engine
+from scholarship_data import KOKO_STEP
+
+DEFAULT_CACHE_PATH = os.environ.get("SPM_ADVICE_CACHE", "advice_cache.sqlite3")
+# 目录校验保证所有 koko_marks 都是 KOKO_STEP 的倍数，按它分段不会改变资格判定结果
+KOKO_BUCKET = KOKO_STEP
+
+
+# --- 1. 缓存键 ---
+
+def normalize_wish(text):
+    """全角/半角统一、大小写折叠、合并空白、去掉首尾标点"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = " ".join(text.split())
+    return text.strip(" .,!?;:。，！？；：~")
+
+
+def koko_bucket(koko):
+    return math.floor(float(koko) / KOKO_BUCKET) * KOKO_BUCKET
+
+
+def advice_key(user_grades, state, religion, race, koko, wish, catalogue=None, version=1):
+    """把学生资料规范化后生成稳定的缓存键；catalogue 是目录版本 (Catalog.version)"""
+    canonical = {
+        "v": version,
+        "catalogue": catalogue,
+        "grades": sorted(user_grades.items()),
+        "state": state,
+        "status": [religion, race],
+        "koko": koko_bucket(koko),
+        "wish": normalize_wish(wish),
+    }
+    raw = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# --- 2. 进程内 LRU ---
+
+class LRUCache:
+    """线程安全的 LRU，可选 TTL，带命中统计"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, stored = item
+                if self.ttl is None or time.time() - stored < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, stored=None):
+        """stored 是条目的写入时间 (默认现在)；从下一层提升上来的条目沿用原来的时间，TTL 不因此延长"""
+        with self._lock:
+            self._data[key] = (value, time.time() if stored is None else stored)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# --- 3. 两层建议缓存 ---
+
+class AdviceCache:
+    """先查内存 LRU，再查 SQLite；两层都有 TTL，磁盘层超过 max_rows 时按最久未用淘汰"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_size=512, max_rows=20000,
+                 ttl=7 * 24 * 3600):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = LRUCache(memory_size, ttl)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS advice ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS advice_accessed ON advice(accessed)")
+        self._db.commit()
+        self.disk_hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM advice WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE advice SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.disk_hits += 1
+        self.memory.put(key, row[0], stored=row[1])
+        return row[0]
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO advice (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._puts += 1
+            # 每 100 次写入清理一次：先删过期，再按最久未用裁到 max_rows
+            if self._puts % 100 == 0:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM advice WHERE created <= ?", (now - self.ttl,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM advice").fetchone()
+        if count > self.max_rows:
+            self._db.execute(
+                "DELETE FROM advice WHERE key IN "
+                "(SELECT key FROM advice ORDER BY accessed LIMIT ?)", (count - self.max_rows,)
+            )
+
+    def stats(self):
+        mem = self.memory.stats()
+        hits = mem["hits"] + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": mem["hits"], "disk_hits": self.disk_hits, "misses": self.misses,
+            "memory_size": mem["size"], "hit_rate": hits / total if total else 0.0,
+        }
+
+
+# --- 4. 匹配结果缓存 ---
+
+# 实测 (1 核)：31 个规则时直接匹配约 5 µs、缓存命中约 7 µs；100 个规则时直接匹配约 9 µs，缓存开始划算
+MEMO_MIN_RULES = 64
+
+
+class MatchMemo:
+    """一份规则 (一个目录版本) 对应一个实例；所有会话共享，键相同的学生直接复用结果。
+    规则少于 min_rules 个时位图匹配本身只要几微秒，比算键 + 查 LRU (加锁) 还快，直接匹配不缓存"""
+
+    def __init__(self, rules, maxsize=32768, min_rules=MEMO_MIN_RULES):
+        self.rules = rules
+        self.index = engine.rule_index(rules)
+        self.cache = LRUCache(maxsize)
+        self.enabled = len(rules) >= min_rules
+
+    def match(self, profile):
+        if not self.enabled:
+            return engine.match(profile, self.rules)
+        key = self.index.profile_key(profile)
+        result = self.cache.get(key)
+        if result is None:
+            result = tuple(engine.match(profile, self.rules))
+            self.cache.put(key, result)
+        return list(result)
+
+    def stats(self):
+        return dict(self.cache.stats(), enabled=int(self.enabled))
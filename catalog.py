@@ -0,0 +1,125 @@
+"""
+可热更新的奖学金目录 (不依赖 Streamlit)
+
+数据文件 (见 scholarship_data.py) 每个版本只读取、校验、编译一次，得到一个不可变的 Catalog：
+州属 / 科目列表、冻结后的条目、编译好的 Rule、位图索引和匹配结果缓存。所有会话共享同一个 Catalog。
+
+CatalogStore.current() 按 mtime 检查文件是否变化 (最多每 check_interval 秒 stat 一次)。
+变化后在锁内重新加载，成功才替换引用 (一次赋值，原子操作)；
+校验失败时继续使用旧版本并记录 last_error。
+每次脚本运行开头取一次 current()，整个运行期间用同一个快照，不会读到一半新一半旧的数据。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import engine
+from cache import MatchMemo
+from scholarship_data import CATALOGUE_PATH, CatalogueError, parse_catalogue
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Catalog:
+    """某个版本的完整目录"""
+    version: str                   # 文件内容哈希
+    path: str
+    mtime: float
+    loaded_at: float
+    states: tuple
+    subjects: tuple
+    db: tuple                      # 冻结后的条目 (卡片渲染用)
+    rules: tuple                   # engine.Rule
+    memo: MatchMemo                # 按规范化资料缓存的匹配结果
+
+    def match(self, profile):
+        return self.memo.match(profile)
+
+    def explain(self, profile):
+        return engine.explain(profile, self.rules)
+
+
+def load_catalog(path=CATALOGUE_PATH):
+    """读取 + 校验 + 编译；失败时抛出 CatalogueError / OSError"""
+    mtime = os.stat(path).st_mtime
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        raw = json.loads(data)
+    except ValueError as e:
+        raise CatalogueError([f"JSON 格式错误：{e}"]) from None
+    states, subjects, db = parse_catalogue(raw)
+    rules = engine.compile_rules(db)
+    return Catalog(
+        version=hashlib.sha256(data).hexdigest()[:12],
+        path=path, mtime=mtime, loaded_at=time.time(),
+        states=states, subjects=subjects, db=db, rules=rules,
+        memo=MatchMemo(rules),  # 同时建好位图索引
+    )
+
+
+class CatalogStore:
+    """持有当前 Catalog，文件修改后自动重新加载"""
+
+    def __init__(self, path=CATALOGUE_PATH, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._catalog = load_catalog(path)
+        self._checked_at = time.monotonic()
+        self.reloads = 0
+        self.last_error = None
+
+    def current(self):
+        """返回当前快照；距离上次检查超过 check_interval 时顺便看一下 mtime"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._maybe_reload()
+        return self._catalog
+
+    def _maybe_reload(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return  # 其他线程刚检查过
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as e:
+                self.last_error = str(e)
+                return
+            if mtime == self._catalog.mtime:
+                return
+            self.reload()
+
+    def reload(self):
+        """强制重新加载；失败时保留旧版本，返回是否成功"""
+        try:
+            catalog = load_catalog(self.path)
+        except (OSError, CatalogueError) as e:
+            self.last_error = str(e)
+            return False
+        self._catalog = catalog
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def stats(self):
+        c = self._catalog
+        return {
+            "version": c.version, "scholarships": len(c.db), "loaded_at": c.loaded_at,
+            "reloads": self.reloads, "last_error": self.last_error, "match_memo": c.memo.stats(),
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else CATALOGUE_PATH
+    try:
+        catalog = load_catalog(path)
+    except CatalogueError as e:
+        print(e)
+        sys.exit(1)
+    print(f"✅ {path}: {len(catalog.db)} 个奖学金，{len(catalog.states)} 个州属，"
+          f"{len(catalog.subjects)} 个科目 (版本 {catalog.version})")
@@ -0,0 +1,224 @@
+"""
+SQLite 版奖学金目录：上千个奖学金 / 贷学金 / 大学课程时，用索引查询代替逐条扫描
+
+表结构：
+- programs：每个条目一行，门槛字段 (州属、A 数量、A+ 数量、Koko、土著 / 宗教) 都是独立列并建索引；
+  data 列保存完整条目 (JSON)，用于卡片渲染
+- hard_req：规范化的逐科要求，一科一行；accepted 是可接受序数的位掩码 (第 r 位 = 序数 r 可接受)，
+  保留 Sarawak 这类“缺 C+”列表的精确语义
+- tags：标签一行一个，按标签过滤时走索引
+
+规则先经过 engine.compile_rule 再写入，所以 A- 计数等编译期语义与内存引擎完全一致。
+查询时学生的各科序数以 JSON 传入，用 json_each 与 hard_req 关联。
+
+    python catalog_db.py build scholarships.sqlite3          # 从当前数据文件建库
+    python -m benchmarks.bench --skip-app                     # 含 10k 条目的查询基准
+"""
+import json
+import sqlite3
+import threading
+
+import engine
+from scholarship_data import CATALOGUE_PATH, read_catalogue
+
+ANY_STATE = "All"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    provider TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    state_req TEXT NOT NULL,
+    muslim_req INTEGER NOT NULL,
+    bumi_req INTEGER NOT NULL,
+    income_req TEXT,
+    min_A_total INTEGER NOT NULL,
+    count_A_minus INTEGER NOT NULL,
+    min_A_plus INTEGER NOT NULL,
+    must_all_A_minus INTEGER NOT NULL,
+    koko_marks REAL NOT NULL,
+    field_only TEXT,
+    field_block TEXT,
+    data TEXT NOT NULL
+);
+-- 覆盖索引：门槛判断不需要回表
+CREATE INDEX IF NOT EXISTS programs_gate ON programs(
+    state_req, min_A_plus, min_A_total, koko_marks,
+    count_A_minus, bumi_req, muslim_req, must_all_A_minus);
+CREATE INDEX IF NOT EXISTS programs_provider ON programs(provider);
+CREATE INDEX IF NOT EXISTS programs_kind ON programs(kind, state_req);
+
+CREATE TABLE IF NOT EXISTS hard_req (
+    program_id INTEGER NOT NULL REFERENCES programs(id) ON DELETE CASCADE,
+    subject TEXT NOT NULL,
+    accepted INTEGER NOT NULL,
+    PRIMARY KEY (program_id, subject)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    program_id INTEGER NOT NULL REFERENCES programs(id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, program_id)
+) WITHOUT ROWID;
+"""
+
+# 州属用 IN ('All', ?) 让 programs_gate 索引按两个等值前缀 + A+ 范围扫描；
+# 其余门槛在索引行上直接判断，逐科要求只对剩下的候选检查。
+ELIGIBLE_SQL = """
+WITH student(subject, rank) AS (SELECT key, value FROM json_each(:ranks))
+SELECT p.id FROM programs p
+WHERE p.state_req IN ('All', :state)
+  AND p.min_A_plus <= :a_plus
+  AND p.min_A_total <= CASE WHEN p.count_A_minus THEN :a_loose ELSE :a_strict END
+  AND p.koko_marks <= :koko
+  AND (:is_bumi OR NOT p.bumi_req)
+  AND (:is_muslim OR NOT p.muslim_req)
+  AND (:all_A_minus OR NOT p.must_all_A_minus)
+  {filters}
+  AND NOT EXISTS (
+      SELECT 1 FROM hard_req h LEFT JOIN student s ON s.subject = h.subject
+      WHERE h.program_id = p.id AND (h.accepted >> COALESCE(s.rank, 0)) & 1 = 0
+  )
+ORDER BY p.id
+"""
+
+
+def accepted_mask(lowest, holes):
+    return sum(1 << r for r in range(lowest, engine.RANK_A_PLUS + 1) if r not in holes)
+
+
+def _plain(sch):
+    """冻结的条目转回普通 dict 以便 JSON 序列化"""
+    out = dict(sch)
+    out["tags"] = list(sch["tags"])
+    out["hard_req"] = {sub: list(g) for sub, g in sch["hard_req"].items()}
+    return out
+
+
+class CatalogDB:
+    """一个 SQLite 连接 + 锁 (与 cache.AdviceCache 相同的用法)"""
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA foreign_keys=ON")
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._entries = {}  # id -> 条目；已加载过的条目直接返回原对象
+        self._sql = {}
+
+    # --- 1. 写入 ---
+
+    def load(self, db):
+        """用一组条目替换整个目录 (一个事务内完成，读者看不到一半的数据)"""
+        programs, reqs, tags = [], [], []
+        for i, sch in enumerate(db):
+            rule = engine.compile_rule(i, sch)
+            programs.append((
+                i, rule.name, sch["provider"], sch.get("kind", "scholarship"),
+                rule.state_req or ANY_STATE, rule.muslim_req, rule.bumi_req, sch.get("income_req"),
+                rule.min_A_total, rule.count_A_minus, rule.min_A_plus, rule.must_all_A_minus,
+                rule.koko_marks, sch.get("field_only"), sch.get("field_block"),
+                json.dumps(_plain(sch), ensure_ascii=False),
+            ))
+            reqs.extend((i, sub, accepted_mask(lowest, holes)) for sub, lowest, holes in rule.hard_req)
+            tags.extend((t, i) for t in dict.fromkeys(sch["tags"]))
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM programs")
+                self._db.executemany(f"INSERT INTO programs VALUES ({', '.join('?' * 16)})", programs)
+                self._db.executemany("INSERT INTO hard_req VALUES (?, ?, ?)", reqs)
+                self._db.executemany("INSERT INTO tags VALUES (?, ?)", tags)
+            self._db.execute("ANALYZE")
+            self._entries = dict(enumerate(db))
+        return len(programs)
+
+    # --- 2. 查询 ---
+
+    def _query(self, provider, field, tags, kind):
+        """按过滤条件组合 SQL (每种组合只拼一次)"""
+        key = (provider is not None, field is not None, len(tags), kind is not None)
+        sql = self._sql.get(key)
+        if sql is None:
+            filters = []
+            if provider is not None:
+                filters.append("AND p.provider = :provider")
+            if kind is not None:
+                filters.append("AND p.kind = :kind")
+            if field is not None:
+                # 指定科系的只在关键词命中时保留；不含科系命中关键词的排除
+                filters.append("AND (p.field_only IS NULL OR instr(lower(p.field_only), :field) > 0)"
+                               " AND (p.field_block IS NULL OR instr(lower(p.field_block), :field) = 0)")
+            for n in range(len(tags)):
+                filters.append(f"AND EXISTS (SELECT 1 FROM tags t WHERE t.tag = :tag{n} AND t.program_id = p.id)")
+            sql = self._sql[key] = ELIGIBLE_SQL.format(filters="\n  ".join(filters))
+        return sql
+
+    def eligible_ids(self, profile, provider=None, field=None, tags=(), kind=None):
+        tags = tuple(tags)
+        params = {
+            "ranks": json.dumps(profile.ranks, ensure_ascii=False),
+            "state": profile.state, "koko": profile.koko,
+            "a_plus": profile.count_A_plus, "a_strict": profile.count_A_strict,
+            "a_loose": profile.count_A_loose, "all_A_minus": profile.all_A_minus,
+            "is_bumi": profile.is_bumi, "is_muslim": profile.is_muslim,
+            "provider": provider, "kind": kind,
+            "field": field.lower() if field is not None else None,
+        }
+        params.update((f"tag{n}", t) for n, t in enumerate(tags))
+        sql = self._query(provider, field, tags, kind)
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql, params)]
+
+    def eligible(self, profile, provider=None, field=None, tags=(), kind=None):
+        """返回符合资格的条目 (目录顺序)；结果与 engine.match 一致"""
+        ids = self.eligible_ids(profile, provider, field, tags, kind)
+        return [self._entry(i) for i in ids]
+
+    def _entry(self, program_id):
+        entry = self._entries.get(program_id)
+        if entry is None:
+            with self._lock:
+                (data,) = self._db.execute("SELECT data FROM programs WHERE id = ?", (program_id,)).fetchone()
+            entry = self._entries[program_id] = json.loads(data)
+        return entry
+
+    def explain_plan(self, **filters):
+        """EXPLAIN QUERY PLAN，用来确认走了索引"""
+        sql = self._query(filters.get("provider"), filters.get("field"),
+                          tuple(filters.get("tags", ())), filters.get("kind"))
+        params = dict.fromkeys(("ranks", "state", "koko", "a_plus", "a_strict", "a_loose", "all_A_minus",
+                                "is_bumi", "is_muslim", "provider", "kind", "field"))
+        params.update(ranks="{}", **{f"tag{n}": None for n in range(len(filters.get("tags", ())))})
+        with self._lock:
+            return [row[-1] for row in self._db.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM programs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def build(path, catalogue_path=CATALOGUE_PATH):
+    """从 JSON 数据文件建库"""
+    _, _, db = read_catalogue(catalogue_path)
+    store = CatalogDB(path)
+    n = store.load(db)
+    store.close()
+    return n
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="从奖学金数据文件建立 SQLite 目录")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("output", help="SQLite 文件路径")
+    parser.add_argument("--catalogue", default=CATALOGUE_PATH, help="JSON 数据文件")
+    args = parser.parse_args()
+    print(f"✅ 已写入 {build(args.output, args.catalogue)} 个条目 -> {args.output}")
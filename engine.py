@@ -0,0 +1,315 @@
+"""
+SPM 奖学金匹配引擎 (不依赖 Streamlit / OpenAI)
+
+SCHOLARSHIP_DB 的每个条目在导入时编译一次成 Rule：
+成绩转换为序数 (A+=10, A=9, A-=8 ... G=1, 未考=0)，hard_req 变成“最低等级”阈值，
+A 的数量是否含 A- 也在编译期定下。点击分析时只剩整数比较。
+
+RuleIndex 再把州属 / 土著 / 宗教 / Koko / A 数量这些“门槛”预先做成位图，
+先用位运算求出候选集，只对候选奖学金检查逐科 hard_req。
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+
+from scholarship_data import GRADE_OPTIONS, SCHOLARSHIP_DB
+
+PLACEHOLDER = "-- 请选择 --"
+
+# --- 1. 成绩序数 ---
+# GRADE_OPTIONS[1:] 由高到低排列，A+ 的序数最大
+GRADE_RANK = {g: len(GRADE_OPTIONS) - i for i, g in enumerate(GRADE_OPTIONS) if g != PLACEHOLDER}
+RANK_A_PLUS = GRADE_RANK["A+"]
+RANK_A = GRADE_RANK["A"]
+RANK_A_MINUS = GRADE_RANK["A-"]
+RANK_NONE = 0
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Rule:
+    """编译后的奖学金规则"""
+    index: int
+    name: str
+    state_req: str | None          # None 表示不限州属
+    muslim_req: bool
+    bumi_req: bool
+    min_A_total: int
+    count_A_minus: bool            # 计算 A 数量时是否包含 A-
+    min_A_plus: int
+    hard_req: tuple                # ((科目, 最低序数, 不接受的序数), ...)
+    must_all_A_minus: bool
+    koko_marks: float
+    sch: dict                      # 原始条目 (只读，卡片渲染用)
+
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    """一个学生的成绩与身份，计数在构建时算好"""
+    grades: dict                   # 科目 -> 等级字符串
+    ranks: dict                    # 科目 -> 序数
+    state: str
+    is_muslim: bool
+    is_bumi: bool
+    koko: float
+    count_A_plus: int
+    count_A_strict: int
+    count_A_loose: int
+    all_A_minus: bool              # 所有科目都不低于 A-
+
+
+@dataclass(frozen=True, slots=True)
+class Verdict:
+    """explain() 的单条结果"""
+    sch: dict
+    eligible: bool
+    reasons: tuple
+
+
+# --- 2. 编译 ---
+
+def _compile_grades(grades):
+    """把 ["A+", "A"] 这类列表转成 (最低序数, 不接受的序数)"""
+    ranks = {GRADE_RANK[g] for g in grades}
+    if not ranks:
+        return RANK_A_PLUS + 1, frozenset()
+    lowest = min(ranks)
+    # 列表中间有“缺口”时 (例如缺了 C+)，保留原来的精确语义
+    holes = frozenset(r for r in range(lowest, RANK_A_PLUS + 1) if r not in ranks)
+    return lowest, holes
+
+
+def compile_rule(index, sch):
+    """把一个 SCHOLARSHIP_DB 条目编译成 Rule"""
+    # count_A_minus 没写时跟随 allow_A_minus
+    count_A_minus = sch.get('count_A_minus', sch['allow_A_minus'])
+    hard_req = tuple(
+        (sub, *_compile_grades(grades)) for sub, grades in sch['hard_req'].items()
+    )
+
+    return Rule(
+        index=index,
+        name=sch['name'],
+        state_req=None if sch['state_req'] == "All" else sch['state_req'],
+        muslim_req=bool(sch.get('muslim_req')),
+        bumi_req=bool(sch.get('bumi_req')),
+        min_A_total=sch['min_A_total'],
+        count_A_minus=count_A_minus,
+        min_A_plus=sch['min_A_plus'],
+        hard_req=hard_req,
+        must_all_A_minus=bool(sch.get('must_all_A_minus')),
+        koko_marks=sch['koko_marks'],
+        sch=sch,
+    )
+
+
+def compile_rules(db):
+    return tuple(compile_rule(i, sch) for i, sch in enumerate(db))
+
+
+RULES = compile_rules(SCHOLARSHIP_DB)
+
+
+# --- 3. 学生资料 ---
+
+def make_profile(grades, state, is_muslim, is_bumi, koko):
+    ranks = {sub: GRADE_RANK.get(g, RANK_NONE) for sub, g in grades.items()}
+    count_A_plus = count_A_strict = count_A_loose = 0
+    all_A_minus = True
+    for r in ranks.values():
+        if r >= RANK_A_MINUS:
+            count_A_loose += 1
+            if r >= RANK_A:
+                count_A_strict += 1
+                if r == RANK_A_PLUS:
+                    count_A_plus += 1
+        else:
+            all_A_minus = False
+    return Profile(
+        grades=dict(grades), ranks=ranks, state=state,
+        is_muslim=bool(is_muslim), is_bumi=bool(is_bumi), koko=koko,
+        count_A_plus=count_A_plus, count_A_strict=count_A_strict,
+        count_A_loose=count_A_loose, all_A_minus=all_A_minus,
+    )
+
+
+# --- 4. 匹配 ---
+
+def _hard_req_ok(rule, ranks):
+    for sub, lowest, holes in rule.hard_req:
+        r = ranks.get(sub, RANK_NONE)
+        if r < lowest or r in holes: return False
+    return True
+
+
+def passes(rule, p):
+    """快速判定 (遇到第一个不符合的条件就返回)"""
+    if rule.state_req is not None and rule.state_req != p.state: return False
+    if rule.muslim_req and not p.is_muslim: return False
+    if rule.bumi_req and not p.is_bumi: return False
+    if p.koko < rule.koko_marks: return False
+    if p.count_A_plus < rule.min_A_plus: return False
+    a_count = p.count_A_loose if rule.count_A_minus else p.count_A_strict
+    if a_count < rule.min_A_total: return False
+    if rule.must_all_A_minus and not p.all_A_minus: return False
+    return _hard_req_ok(rule, p.ranks)
+
+
+def failures(rule, p):
+    """列出所有不符合的条件 (用于解释)"""
+    reasons = []
+    if rule.state_req is not None and rule.state_req != p.state:
+        reasons.append(f"仅限 {rule.state_req} 州属")
+    if rule.muslim_req and not p.is_muslim:
+        reasons.append("仅限穆斯林")
+    if rule.bumi_req and not p.is_bumi:
+        reasons.append("仅限土著 (Bumiputera)")
+    a_count = p.count_A_loose if rule.count_A_minus else p.count_A_strict
+    if a_count < rule.min_A_total:
+        label = "A (含 A-)" if rule.count_A_minus else "A (A+/A)"
+        reasons.append(f"{label} 数量不足：{a_count}/{rule.min_A_total}")
+    for sub, lowest, holes in rule.hard_req:
+        r = p.ranks.get(sub, RANK_NONE)
+        if r < lowest or r in holes:
+            need = "/".join(g for g, gr in GRADE_RANK.items() if gr >= lowest and gr not in holes)
+            reasons.append(f"{sub} 需要 {need} (当前 {p.grades.get(sub, '未考')})")
+    if p.count_A_plus < rule.min_A_plus:
+        reasons.append(f"A+ 数量不足：{p.count_A_plus}/{rule.min_A_plus}")
+    if rule.must_all_A_minus and not p.all_A_minus:
+        reasons.append("所有科目不得低于 A-")
+    if p.koko < rule.koko_marks:
+        reasons.append(f"Koko 分数不足：{p.koko}/{rule.koko_marks}")
+    return tuple(reasons)
+
+
+def match(profile, rules=RULES):
+    """返回符合资格的奖学金条目 (保持 SCHOLARSHIP_DB 的顺序)"""
+    index = rule_index(rules)
+    ranks = profile.ranks
+    out = []
+    for k in index.iter_bits(index.candidates(profile)):
+        rule = rules[k]
+        if _hard_req_ok(rule, ranks):
+            out.append(rule.sch)
+    return out
+
+
+def explain(profile, rules=RULES):
+    """返回每个奖学金的判定结果与不符合原因"""
+    verdicts = []
+    for rule in rules:
+        reasons = failures(rule, profile)
+        verdicts.append(Verdict(sch=rule.sch, eligible=not reasons, reasons=reasons))
+    return verdicts
+
+
+# --- 5. 位图预筛选索引 ---
+
+def _prefix_masks(rules, key):
+    """按门槛值排序，返回 (排序后的门槛, 前缀位图)；前缀位图[i] = 门槛最低的 i 个规则"""
+    ordered = sorted(rules, key=key)
+    values = [key(r) for r in ordered]
+    masks = [0]
+    for r in ordered:
+        masks.append(masks[-1] | (1 << r.index))
+    return values, masks
+
+
+class RuleIndex:
+    """第 k 位代表 rules[k]；各门槛的位图在构建时算好，查询只做 bisect + 位与"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.all_mask = (1 << len(rules)) - 1
+        bit = lambda r: 1 << r.index
+
+        # 州属：不限州属的规则出现在每个州的位图里
+        self.any_state_mask = sum(bit(r) for r in rules if r.state_req is None)
+        self.state_masks = {}
+        for r in rules:
+            if r.state_req is not None:
+                self.state_masks[r.state_req] = self.state_masks.get(r.state_req, self.any_state_mask) | bit(r)
+
+        # 土著 / 宗教：没有身份的学生只能看到没有该要求的规则
+        self.bumi_masks = {True: self.all_mask, False: sum(bit(r) for r in rules if not r.bumi_req)}
+        self.muslim_masks = {True: self.all_mask, False: sum(bit(r) for r in rules if not r.muslim_req)}
+
+        # Koko：排序后的门槛，位图[i] = koko_marks <= 第 i 个门槛的规则
+        self.koko_levels = sorted({r.koko_marks for r in rules})
+        self.koko_masks = [
+            sum(bit(r) for r in rules if r.koko_marks <= level) for level in self.koko_levels
+        ]
+
+        # A+ / A 数量：排序数组 + 前缀位图 (A 数量按严格 / 含 A- 两组分别排序)
+        self.a_plus_values, self.a_plus_masks = _prefix_masks(rules, lambda r: r.min_A_plus)
+        strict = [r for r in rules if not r.count_A_minus]
+        loose = [r for r in rules if r.count_A_minus]
+        self.strict_values, self.strict_masks = _prefix_masks(strict, lambda r: r.min_A_total)
+        self.loose_values, self.loose_masks = _prefix_masks(loose, lambda r: r.min_A_total)
+
+        self.must_all_mask = sum(bit(r) for r in rules if r.must_all_A_minus)
+
+        # 规范化资料键：只有出现在某个 hard_req 里的科目会影响结果；
+        # 每科的序数再按“通过哪些 hard_req 条件”分组，例如只要求 A/A+ 时，B 和 G 是同一组
+        conditions = {}
+        for r in rules:
+            for sub, lowest, holes in r.hard_req:
+                conditions.setdefault(sub, set()).add((lowest, holes))
+        self.key_subjects = tuple(sorted(conditions))
+        self.rank_classes = []
+        for sub in self.key_subjects:
+            signatures = [
+                tuple(lowest <= rank and rank not in holes for lowest, holes in sorted(conditions[sub], key=repr))
+                for rank in range(RANK_A_PLUS + 1)
+            ]
+            ids = {}
+            self.rank_classes.append(tuple(ids.setdefault(sig, len(ids)) for sig in signatures))
+
+    def gates(self, p):
+        """只看州属 / 身份 / Koko (改成绩也无法改变的条件) 的位图"""
+        mask = self.state_masks.get(p.state, self.any_state_mask)
+        mask &= self.bumi_masks[p.is_bumi]
+        mask &= self.muslim_masks[p.is_muslim]
+
+        i = bisect_right(self.koko_levels, p.koko)
+        return mask & self.koko_masks[i - 1] if i else 0
+
+    def candidates(self, p):
+        """返回通过所有“非逐科”门槛的候选位图"""
+        mask = self.gates(p)
+        if not mask: return 0
+
+        mask &= self.a_plus_masks[bisect_right(self.a_plus_values, p.count_A_plus)]
+        mask &= (self.strict_masks[bisect_right(self.strict_values, p.count_A_strict)]
+                 | self.loose_masks[bisect_right(self.loose_values, p.count_A_loose)])
+        if not p.all_A_minus:
+            mask &= ~self.must_all_mask
+        return mask
+
+    def profile_key(self, p):
+        """资格只取决于这个键：两个键相同的学生，匹配结果一定相同。
+        计数和 Koko 换成在排序门槛中的位置，没有专属规则的州属归为 None，
+        逐科成绩只保留 hard_req 涉及的科目，并换成该科的等级分组。"""
+        return (
+            p.state if p.state in self.state_masks else None,
+            p.is_bumi, p.is_muslim,
+            bisect_right(self.koko_levels, p.koko),
+            bisect_right(self.a_plus_values, p.count_A_plus),
+            bisect_right(self.strict_values, p.count_A_strict),
+            bisect_right(self.loose_values, p.count_A_loose),
+            p.all_A_minus or not self.must_all_mask,
+            tuple(classes[p.ranks.get(sub, RANK_NONE)]
+                  for sub, classes in zip(self.key_subjects, self.rank_classes)),
+        )
+
+    @staticmethod
+    def iter_bits(mask):
+        """从低位到高位逐个取出位置 (即 SCHOLARSHIP_DB 顺序)"""
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+
+@lru_cache(maxsize=8)
+def rule_index(rules):
+    return RuleIndex(rules)
@@ -0,0 +1,163 @@
+"""
+本地假 DeepSeek 服务器 (OpenAI chat-completions 兼容)
+
+用于调度器、压测和基准测试：可配置响应延迟、逐字延迟和错误率，不消耗真实 API 额度。
+usage 里的 prompt_cache_hit_tokens 模拟 DeepSeek 的前缀缓存 (按 64 字符块匹配之前请求的前缀)。
+
+用法：
+    python fake_deepseek.py --port 8808 --latency 0.5 --token-delay 0.02 --error-rate 0.1
+    然后设置 DEEPSEEK_BASE_URL=http://127.0.0.1:8808
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "同学你好！根据你的成绩，建议优先考虑 STPM 或 Matrikulasi，并尽早准备奖学金申请。"
+CACHE_BLOCK = 64
+
+
+class FakeDeepSeekServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, token_delay=0.0, error_rate=0.0,
+                 error_status=503, reply=DEFAULT_REPLY, seed=None):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.disconnects = 0
+        self._prefixes = set()
+
+    def cached_prefix(self, text):
+        """返回与之前请求相同的前缀长度 (按块对齐)，并记录本次请求的所有块前缀"""
+        blocks = range(CACHE_BLOCK, len(text) + 1, CACHE_BLOCK)
+        with self.lock:
+            hit = 0
+            for end in blocks:
+                if hash(text[:end]) not in self._prefixes:
+                    break
+                hit = end
+            self._prefixes.update(hash(text[:end]) for end in blocks)
+        return hit
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        srv = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        req = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+
+        with srv.lock:
+            srv.requests += 1
+            fail = srv.rng.random() < srv.error_rate
+            if fail:
+                srv.errors += 1
+        time.sleep(srv.latency)
+        if fail:
+            self._json(srv.error_status, {"error": {"message": "fake upstream error", "type": "server_error"}})
+            return
+
+        prompt = "\x00".join(m.get("content", "") for m in req.get("messages", []))
+        prompt_tokens = len(prompt) // 3
+        hit_tokens = srv.cached_prefix(prompt) // 3
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(srv.reply),
+            "total_tokens": prompt_tokens + len(srv.reply),
+            "prompt_cache_hit_tokens": hit_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+        }
+        base = {"id": "fake-1", "created": int(time.time()), "model": req.get("model", "deepseek-chat")}
+
+        if not req.get("stream"):
+            self._json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": srv.reply},
+            }]))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for ch in srv.reply:
+                chunk = dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "finish_reason": None, "delta": {"content": ch},
+                }])
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if srv.token_delay:
+                    time.sleep(srv.token_delay)
+            last = dict(base, object="chat.completion.chunk", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop", "delta": {},
+            }])
+            self.wfile.write(f"data: {json.dumps(last, ensure_ascii=False)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端中途断开 (请求被取消)
+            with srv.lock:
+                srv.disconnects += 1
+
+
+def start_fake_server(port=0, **options):
+    """在后台线程启动，返回 server (server.url 为 base_url)"""
+    server = FakeDeepSeekServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地假 DeepSeek chat-completions 服务器")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.5, help="首包延迟 (秒)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="流式输出每个字的延迟 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的比例 (0-1)")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args(argv)
+
+    server = FakeDeepSeekServer(
+        ("127.0.0.1", args.port), latency=args.latency, token_delay=args.token_delay,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+    print(f"🤖 Fake DeepSeek 运行中：{server.url}  (Ctrl+C 停止)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
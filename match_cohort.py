@@ -0,0 +1,103 @@
+"""
+整届考生批量匹配 (命令行)
+
+读取一个 CSV / Parquet 成绩文件 (科目列名与 SUBJECT_LIST 相同，等级与 GRADE_OPTIONS 相同，
+外加 state / bumi / muslim / koko 列)，分块交给进程池计算，按原顺序边算边写出结果。
+同一时间只有 workers × 2 个分块在内存中，文件再大内存也不会涨。
+
+用法：
+    python match_cohort.py results.csv -o eligible.csv --workers 8 --chunksize 20000
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import batch
+
+OUTPUT_COLUMNS = ["student_id", "eligible_count", "eligible_scholarships"]
+NAME_SEPARATOR = " | "
+
+
+def iter_chunks(path, chunksize):
+    """按块读取输入文件，每块是一个 DataFrame"""
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("⚠️ 读取 Parquet 需要安装 pyarrow：pip install pyarrow")
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield record_batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+
+def process_chunk(chunk, id_column, first_row):
+    """进程池中执行：编码成绩 -> 资格矩阵 -> 名单"""
+    encoded = batch.encode_grades(chunk)
+    matrix = batch.eligibility_matrix(encoded)
+    names = batch.eligible_names(matrix)
+    if id_column and id_column in chunk.columns:
+        ids = chunk[id_column].astype(str).tolist()
+    else:
+        ids = [str(first_row + i) for i in range(len(chunk))]
+    return [(sid, len(n), NAME_SEPARATOR.join(n)) for sid, n in zip(ids, names)]
+
+
+def run(path, out, workers, chunksize, id_column, progress=sys.stderr):
+    writer = csv.writer(out)
+    writer.writerow(OUTPUT_COLUMNS)
+
+    started = time.perf_counter()
+    done_rows = 0
+    next_row = 0
+    pending = deque()
+
+    def drain_one():
+        nonlocal done_rows
+        rows = pending.popleft().result()
+        writer.writerows(rows)
+        done_rows += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"\r📊 {done_rows:,} rows  {done_rows / max(elapsed, 1e-9):,.0f} rows/s",
+              end="", file=progress, flush=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in iter_chunks(path, chunksize):
+            pending.append(pool.submit(process_chunk, chunk, id_column, next_row))
+            next_row += len(chunk)
+            # 背压：在途分块过多时先写出最早的一块
+            while len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ 完成：{done_rows:,} rows，用时 {elapsed:.2f}s "
+          f"({done_rows / max(elapsed, 1e-9):,.0f} rows/s)", file=progress)
+    return done_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量计算整届考生符合资格的奖学金")
+    parser.add_argument("input", help="成绩文件 (.csv / .parquet)")
+    parser.add_argument("-o", "--output", default="-", help="输出 CSV 路径 (默认 stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="进程数")
+    parser.add_argument("--chunksize", type=int, default=20000, help="每块行数")
+    parser.add_argument("--id-column", default="student_id", help="学生编号列 (没有则用行号)")
+    args = parser.parse_args(argv)
+
+    if args.output == "-":
+        run(args.input, sys.stdout, args.workers, args.chunksize, args.id_column)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            run(args.input, out, args.workers, args.chunksize, args.id_column)
+
+
+if __name__ == "__main__":
+    main()
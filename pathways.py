@@ -0,0 +1,175 @@
+"""
+本地升学路径建议 (不依赖 Streamlit，也不调用 AI)
+
+prompts.GENERAL_REQUIREMENTS 里给 DeepSeek 的“入学标准小抄”本身就是确定的规则，
+这里直接按学生成绩套用：STPM、Matrikulasi、Asasi、Diploma、IPTS 各给出
+“推荐 / 可以考虑 / 不建议”和理由。几十微秒就能算完，点击“分析”后立即显示；
+AI 的建议在它下面逐字出现。AI 未配置、排队过多或超时的时候，这就是学生得到的全部答案。
+
+阈值按小抄的文字取整 (见各规则的注释)，只作方向性建议，不代替官方入学条件。
+
+    python pathways.py       # 几种典型成绩的建议与耗时
+"""
+from dataclasses import dataclass
+
+from engine import GRADE_RANK, RANK_A_MINUS
+
+RANK_B = GRADE_RANK["B"]
+RANK_CREDIT = GRADE_RANK["C"]  # SPM 的 kredit：C 及以上
+
+RECOMMENDED, POSSIBLE, UNLIKELY = "recommended", "possible", "unlikely"
+LEVEL_LABELS = {RECOMMENDED: "✅ 推荐", POSSIBLE: "🤔 可以考虑", UNLIKELY: "⛔ 不建议"}
+_LEVEL_ORDER = {RECOMMENDED: 0, POSSIBLE: 1, UNLIKELY: 2}
+
+STPM_CORE = ("Bahasa Melayu", "Sejarah")
+MANY_A = 5          # Asasi：“usually needs multiple As”
+SOME_A = 3
+MIN_CREDITS = 3     # IPTS：“usually 3-5 Credits”；Diploma 同样按 3 个 kredit 起算
+
+
+@dataclass(frozen=True, slots=True)
+class GradeSummary:
+    """套用规则需要的成绩统计"""
+    subjects: int
+    a_count: int        # A- 及以上
+    b_count: int        # B 及以上 (含 A)
+    credits: int        # C 及以上
+    weak: int           # 低于 C (D / E / G)
+
+
+@dataclass(frozen=True, slots=True)
+class PathwayFit:
+    """一条升学路径的判断"""
+    key: str
+    name: str
+    level: str
+    reasons: tuple
+    note: str
+
+
+@dataclass(frozen=True, slots=True)
+class PathwayAdvice:
+    summary: str
+    fits: tuple         # 按 推荐 -> 可以考虑 -> 不建议 排序
+
+    def to_dict(self):
+        return {
+            "summary": self.summary,
+            "pathways": [
+                {"key": f.key, "name": f.name, "level": f.level, "reasons": list(f.reasons), "note": f.note}
+                for f in self.fits
+            ],
+        }
+
+
+# --- 1. 成绩统计 ---
+
+def summarize(profile):
+    ranks = [r for r in profile.ranks.values() if r]
+    return GradeSummary(
+        subjects=len(ranks),
+        a_count=sum(1 for r in ranks if r >= RANK_A_MINUS),
+        b_count=sum(1 for r in ranks if r >= RANK_B),
+        credits=sum(1 for r in ranks if r >= RANK_CREDIT),
+        weak=sum(1 for r in ranks if r < RANK_CREDIT),
+    )
+
+
+# --- 2. 各路径规则 (对应 GENERAL_REQUIREMENTS 第 2-6 条) ---
+
+def _asasi(s, profile):
+    if s.a_count >= MANY_A:
+        return RECOMMENDED, (f"有 {s.a_count} 个 A，够得上竞争激烈的 Asasi",)
+    if s.a_count >= SOME_A:
+        return POSSIBLE, (f"有 {s.a_count} 个 A；Asasi 竞争激烈，通常需要更多 A",)
+    return UNLIKELY, (f"只有 {s.a_count} 个 A，Asasi 通常需要多个 A",)
+
+
+def _matrikulasi(s, profile):
+    # “mix of A and B”：大部分科目 B 以上，并且有 A；“mostly C/D” 不建议
+    if s.b_count * 10 >= s.subjects * 7 and s.a_count >= 2:
+        return RECOMMENDED, (f"{s.b_count}/{s.subjects} 科 B 以上，其中 {s.a_count} 个 A",)
+    if s.b_count * 2 >= s.subjects and s.weak <= 1:
+        return POSSIBLE, (f"{s.b_count}/{s.subjects} 科 B 以上，理科名额竞争较大",)
+    return UNLIKELY, (f"B 以上只有 {s.b_count}/{s.subjects} 科，大部分是 C/D 时不建议轻易选理科预科",)
+
+
+def _stpm(s, profile):
+    missing = [sub for sub in STPM_CORE if profile.ranks.get(sub, 0) < RANK_CREDIT]
+    if missing:
+        return UNLIKELY, (f"{' / '.join(missing)} 需要至少 C (kredit)",)
+    if s.a_count >= MANY_A:
+        return POSSIBLE, ("BM 和 Sejarah 都有 kredit；成绩好也可以走 STPM，但 Asasi / Matrikulasi 更快",)
+    return RECOMMENDED, ("BM 和 Sejarah 都有 kredit；最容易进入的路线，适合 B/C 成绩再拼一次",)
+
+
+def _diploma(s, profile):
+    if s.credits < MIN_CREDITS:
+        return UNLIKELY, (f"只有 {s.credits} 个 kredit，通常需要至少 {MIN_CREDITS} 个",)
+    if s.a_count >= MANY_A:
+        return POSSIBLE, (f"{s.credits} 个 kredit；成绩好也可以选 Diploma，但可以先争取预科",)
+    return RECOMMENDED, (f"{s.credits} 个 kredit；适合 B/C/D 成绩，重视技能",)
+
+
+def _ipts(s, profile):
+    if s.credits < MIN_CREDITS:
+        return UNLIKELY, (f"只有 {s.credits} 个 kredit，私立大学通常要求 3-5 个",)
+    return POSSIBLE, (f"{s.credits} 个 kredit，入学条件灵活；需要学费 / 贷款 (PTPTN)",)
+
+
+# (key, 名称, 说明, 规则)
+PATHWAYS = (
+    ("asasi", "Asasi (公立大学基础课程)", "一年制，直升本地公立大学学位", _asasi),
+    ("matrikulasi", "Matrikulasi (预科)", "一年制，名额多，理科竞争较大", _matrikulasi),
+    ("stpm", "STPM (Form 6)", "一年半，全国认可，可申请所有公立大学", _stpm),
+    ("diploma", "Diploma (UPU / Politeknik)", "两年半到三年，偏实用技能，可转读学位", _diploma),
+    ("ipts", "IPTS (私立大学 / 学院)", "课程选择多，开学灵活，但费用较高", _ipts),
+)
+
+
+# --- 3. 建议 ---
+
+def advise(profile, eligible=()):
+    """profile 来自 engine.make_profile，eligible 是奖学金匹配结果；返回 PathwayAdvice"""
+    s = summarize(profile)
+    if not s.subjects:
+        return PathwayAdvice(summary="先在上方填写 SPM 成绩，才能判断适合的升学路径。", fits=())
+
+    fits = []
+    for key, name, note, rule in PATHWAYS:
+        level, reasons = rule(s, profile)
+        fits.append(PathwayFit(key=key, name=name, level=level, reasons=reasons, note=note))
+    fits.sort(key=lambda f: _LEVEL_ORDER[f.level])
+
+    short = lambda level: "、".join(f.name.split(" (")[0] for f in fits if f.level == level)
+    summary = f"{s.subjects} 科中 {s.a_count} 个 A、{s.credits} 个 kredit。"
+    if short(RECOMMENDED):
+        summary += f"建议优先考虑：{short(RECOMMENDED)}。"
+    elif short(POSSIBLE):
+        summary += f"可以考虑：{short(POSSIBLE)}。"
+    else:
+        summary += "离各路线的一般门槛还有距离，可以考虑重考 (SPM Ulangan) 提升 BM / Sejarah 等关键科目，或请学校辅导老师推荐技能课程。"
+    if eligible:
+        summary = f"你符合 {len(eligible)} 个奖学金 / 贷学金，记得同时申请。" + summary
+    return PathwayAdvice(summary=summary, fits=tuple(fits))
+
+
+if __name__ == "__main__":
+    import time
+
+    import engine
+
+    samples = {
+        "全 A": {"Bahasa Melayu": "A+", "Sejarah": "A", "Matematik": "A+", "Bahasa Inggeris": "A", "Fizik": "A", "Kimia": "A-"},
+        "A/B 混合": {"Bahasa Melayu": "A", "Sejarah": "B+", "Matematik": "A-", "Bahasa Inggeris": "B", "Sains": "B+"},
+        "B/C": {"Bahasa Melayu": "B", "Sejarah": "C+", "Matematik": "C", "Bahasa Inggeris": "B", "Sains": "C"},
+        "C/D": {"Bahasa Melayu": "C", "Sejarah": "D", "Matematik": "D", "Bahasa Inggeris": "E", "Sains": "C"},
+    }
+    for label, grades in samples.items():
+        profile = engine.make_profile(grades, "Selangor", False, False, 8.5)
+        t0 = time.perf_counter()
+        advice = advise(profile)
+        elapsed = (time.perf_counter() - t0) * 1e6
+        print(f"\n[{label}] {advice.summary}  ({elapsed:.0f} µs)")
+        for f in advice.fits:
+            print(f"  {LEVEL_LABELS[f.level]:<8} {f.name}: {'；'.join(f.reasons)}")
@@ -0,0 +1,131 @@
+"""
+DeepSeek Prompt 构建 (不依赖 Streamlit)
+
+布局按“前缀缓存”设计：DeepSeek 会缓存请求开头与之前请求完全相同的部分 (按 token 前缀匹配)，
+命中的部分更便宜、首字更快。所以所有不变的内容 (人设、参考资料、回答要求) 合成一条固定的
+system 消息放在最前面，逐字节不变；每个学生不同的资料放在最后的 user 消息里。
+
+user 消息有输入 token 预算：愿望文字截断到 MAX_WISH_CHARS，奖学金列表只放匹配度最高的
+PROMPT_TOP_K 个 (调用方用 ranking.top_k 选出)；成绩表和奖学金列表超出预算时只保留前面的，
+并注明省略了多少个。
+token 数用 DeepSeek 文档给的比例估算 (英文约 0.3 token/字符，中文约 0.6)。
+"""
+import math
+
+# 🌟 AI 设定优化：强制中文 + 马来西亚升学顾问人设
+SYSTEM_PROMPT = "You are an experienced Malaysian education counselor (Cikgu). Your tone is encouraging, empathetic, and realistic. Analyze the student's SPM results and wish. 1. Recommend best scholarships. 2. Suggest alternatives if none qualify. 3. CRITICAL RULE: You MUST reply primarily in CHINESE (Malaysian Mandarin). Even if the user asks nonsense or inappropriate questions, you must politely guide them back or refuse in CHINESE. Do not switch to English blocks unless explaining specific terms."
+
+# === 👇 给 AI 的“入学标准小抄” (Knowledge Base)，防止幻觉 ===
+GENERAL_REQUIREMENTS = """Reference Guidelines for Malaysia Pathways (Use this to advise):
+1. JPA/Petronas/Top Scholarships: strictly requires A+/A grades.
+2. Matrikulasi (Science): Generally requires decent results (mix of A and B). If a student has mostly C/D, do NOT recommend Matrikulasi Science lightly.
+3. Asasi (Public Uni Foundation): Highly competitive, usually needs multiple As.
+4. STPM (Form 6): The most accessible route. Open to almost anyone with credits (C) in BM and Sejarah. Best for students with average results (B/C) who want a second chance.
+5. Diploma (UPU/Polytechnic): Good for students with B/C/D grades. Focus on skills.
+6. IPTS (Private): Entry is flexible (usually 3-5 Credits), but requires money/loans (PTPTN).
+"""
+
+INSTRUCTIONS = """Based on the Student Profile, SPM Results, and the [IMPORTANT REFERENCE DATA] above:
+1. If scholarships are listed, recommend the best fit.
+2. If NO scholarships are listed, suggest realistic alternatives (STPM, Matrikulasi, Diploma) based on their specific grades.
+3. BE REALISTIC. If grades are mostly B/C, recommend STPM or Diploma, NOT Asasi/Matrikulasi Science.
+4. Keep the advice encouraging but honest.
+5. CRITICAL RULE: Reply primarily in CHINESE (Malaysian Mandarin).
+The student's data is in the next message."""
+
+# 固定前缀：不要在这里放任何随学生变化的内容
+STATIC_SYSTEM_MESSAGE = (
+    f"{SYSTEM_PROMPT}\n\n[IMPORTANT REFERENCE DATA]\n{GENERAL_REQUIREMENTS}\n{INSTRUCTIONS}"
+)
+
+NO_SCHOLARSHIP_LINE = "None. The student did not qualify for any scholarships in the database.\n"
+
+# 输入预算 (system + user)；max_tokens=1000 的输出另计
+INPUT_TOKEN_BUDGET = 1500
+MAX_WISH_CHARS = 300
+MESSAGE_OVERHEAD_TOKENS = 4  # 每条消息的角色标记等
+OMIT_LINE_TOKENS = 12  # “- ... and N more” 一行
+PROMPT_TOP_K = 10  # 目录有几百个条目时，prompt 里只列匹配度最高的这么多个
+
+
+# --- 1. token 估算 ---
+
+def estimate_tokens(text):
+    """按 DeepSeek 文档的经验比例估算；ASCII 约 0.3 token/字符，其余 (中文等) 约 0.6"""
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    return math.ceil(ascii_chars * 0.3 + (len(text) - ascii_chars) * 0.6)
+
+
+STATIC_TOKENS = estimate_tokens(STATIC_SYSTEM_MESSAGE) + MESSAGE_OVERHEAD_TOKENS
+# 成绩表再长也要给奖学金列表留的最少位置 (放得下“没有奖学金”或“省略”那一行)
+LIST_RESERVE_TOKENS = max(estimate_tokens(NO_SCHOLARSHIP_LINE), OMIT_LINE_TOKENS)
+
+
+def estimate_messages_tokens(messages):
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+# --- 2. 学生资料 (user 消息) ---
+
+def _profile_block(profile, religion, race, student_wish, grades):
+    wish = (student_wish or "")[:MAX_WISH_CHARS]
+    return (
+        "Student Profile:\n"
+        f"- State: {profile.state}\n"
+        f"- Religion/Race Status: {religion}, {race}\n"
+        f"- Koko Score: {profile.koko}/10\n"
+        "\n"
+        "SPM Results:\n"
+        f"{grades}"
+        f"Summary: {profile.count_A_plus} A+, {profile.count_A_strict} A (A+/A), "
+        f"{profile.count_A_loose} A (including A-).\n"
+        "\n"
+        f"Student's Wish/Question: \"{wish}\"\n"
+        "\n"
+        "Eligible Scholarships (based on hard requirements, best fit first):\n"
+    )
+
+
+def _take_lines(lines, total, remaining, unit=""):
+    """按顺序放入 lines (共 total 行)，放不下时停下并注明省略了多少个；返回 (文本, 剩余 token)"""
+    out = []
+    for i, line in enumerate(lines):
+        # 给“省略”那一行留位置
+        reserve = 0 if i == total - 1 else OMIT_LINE_TOKENS
+        cost = estimate_tokens(line)
+        if cost + reserve > remaining:
+            break
+        out.append(line)
+        remaining -= cost
+    if len(out) < total:
+        omitted = f"- ... and {total - len(out)} more{unit}\n"
+        out.append(omitted)
+        remaining -= estimate_tokens(omitted)
+    return "".join(out), remaining
+
+
+def build_ai_prompt(profile, religion, race, student_wish, eligible, budget=INPUT_TOKEN_BUDGET, total=None):
+    """返回 user 消息 (只含学生资料)；profile 来自 engine.make_profile，eligible 是匹配结果
+    (通常是 ranking.top_k 选出的前几名，total 为符合资格的总数)。
+    加上固定的 system 消息后估算不超过 budget 个 token：成绩表先用 (给奖学金列表留出
+    LIST_RESERVE_TOKENS)，科目多到放不下时同样只保留前面的，剩下的预算给奖学金列表。"""
+    remaining = (budget - STATIC_TOKENS - MESSAGE_OVERHEAD_TOKENS
+                 - estimate_tokens(_profile_block(profile, religion, race, student_wish, "")))
+    grade_lines = [f"- {sub}: {grade}\n" for sub, grade in profile.grades.items()]
+    grades, remaining = _take_lines(grade_lines, len(grade_lines), remaining - LIST_RESERVE_TOKENS, " subjects")
+    text = _profile_block(profile, religion, race, student_wish, grades)
+    if not eligible:
+        return text + NO_SCHOLARSHIP_LINE
+
+    total = max(total or 0, len(eligible))
+    listing, _ = _take_lines((f"- {sch['name']}\n" for sch in eligible), total,
+                             remaining + LIST_RESERVE_TOKENS)
+    return text + listing
+
+
+def build_messages(user_prompt):
+    """固定 system 前缀 + 学生 user 消息"""
+    return [
+        {"role": "system", "content": STATIC_SYSTEM_MESSAGE},
+        {"role": "user", "content": user_prompt},
+    ]
@@ -0,0 +1,115 @@
+"""
+符合资格的奖学金按“匹配度”排序 (不依赖 Streamlit)
+
+engine.match 按 SCHOLARSHIP_DB 的顺序返回所有符合资格的条目。目录扩充到几百个之后，
+学生 (和 AI prompt) 需要的是“最值得先申请的几个”。每个条目的分数由两部分组成：
+
+- 声望等级分：数据文件里的 tier (1-3)；没写时按门槛推算 (A+ / A 要求越高越顶尖，贷学金最低)。
+  等级分的间隔大于余量分的上限，所以符合资格的顶尖奖学金总是排在前面
+- 余量分：A 数量 (按规则是否含 A-)、A+ 数量、Koko 超出门槛多少，hard_req 各科平均高出最低等级多少。
+  每项封顶后归一化到 0-1，余量越大越稳；只决定同一等级内的先后
+
+只需要前 k 个时用 heapq.nlargest (O(n log k))，不对整个列表排序；分数相同的保持目录顺序。
+
+    python ranking.py       # 示例学生的排序结果，以及大目录上 top-k 与完整排序的耗时
+"""
+import heapq
+from functools import lru_cache
+
+from engine import RANK_NONE, RULES
+
+# --- 1. 声望等级 ---
+
+ELITE_A_PLUS = 5        # 要求 5 个以上 A+，或 8 个以上 A：顶尖
+ELITE_A = 8
+MAINSTREAM_A = 6        # 6-7 个 A：主流
+TIER_POINTS = {1: 10.0, 2: 5.0, 3: 0.0}
+
+# 余量封顶：多出这么多就算“很稳”，再多也不加分
+MARGIN_CAP = 3          # A / A+ 数量
+KOKO_CAP = 2.0
+SLACK_CAP = 2           # hard_req 每科平均高出的级数
+FIT_MAX = 4.0           # 四项余量分之和的上限 (小于等级分间隔)
+
+
+def tier_of(sch):
+    """数据文件写了 tier 就用它；否则按门槛推算，贷学金一律算一般"""
+    tier = sch.get("tier")
+    if tier is not None:
+        return tier
+    if sch.get("kind") == "loan":
+        return 3
+    if sch["min_A_plus"] >= ELITE_A_PLUS or sch["min_A_total"] >= ELITE_A:
+        return 1
+    if sch["min_A_total"] >= MAINSTREAM_A:
+        return 2
+    return 3
+
+
+# --- 2. 余量 ---
+
+def fit(rule, p):
+    """0 到 FIT_MAX；只对符合资格的规则有意义 (余量都不小于 0)"""
+    a_count = p.count_A_loose if rule.count_A_minus else p.count_A_strict
+    score = min(a_count - rule.min_A_total, MARGIN_CAP) / MARGIN_CAP
+    score += min(p.count_A_plus - rule.min_A_plus, MARGIN_CAP) / MARGIN_CAP
+    score += min(p.koko - rule.koko_marks, KOKO_CAP) / KOKO_CAP
+    if rule.hard_req:
+        slack = sum(p.ranks.get(sub, RANK_NONE) - lowest for sub, lowest, _ in rule.hard_req)
+        score += min(slack / len(rule.hard_req), SLACK_CAP) / SLACK_CAP
+    else:
+        score += 1.0  # 没有逐科要求
+    return score
+
+
+@lru_cache(maxsize=8)
+def _rule_table(rules):
+    """条目名称 -> (规则, 等级分)；每个目录版本只算一次。
+    按名称 (目录内唯一) 而不是 id(条目) 查：热更新后新条目可能复用旧对象的 id"""
+    return {r.name: (r, TIER_POINTS[tier_of(r.sch)]) for r in rules}
+
+
+def score(rule, p):
+    return TIER_POINTS[tier_of(rule.sch)] + fit(rule, p)
+
+
+# --- 3. 排序 ---
+
+def top_k(profile, eligible, rules=RULES, k=None):
+    """eligible 是 engine.match / Catalog.match 的结果 (条目来自 rules)；
+    返回分数最高的 k 个 (k 为 None 时返回全部)，由高到低"""
+    table = _rule_table(rules)
+
+    def key(sch):
+        rule, points = table[sch["name"]]
+        return points + fit(rule, profile)
+
+    return heapq.nlargest(len(eligible) if k is None else k, eligible, key=key)
+
+
+if __name__ == "__main__":
+    import time
+
+    import engine
+    from benchmarks.synth import synth_catalogue
+
+    grades = {"Bahasa Melayu": "A+", "Bahasa Inggeris": "A", "Sejarah": "A", "Matematik": "A+",
+              "Matematik Tambahan": "A", "Fizik": "A-", "Kimia": "A", "Biologi": "B+", "Pendidikan Moral": "A"}
+    profile = engine.make_profile(grades, "Selangor", False, False, 8.5)
+    eligible = engine.match(profile)
+    print(f"符合资格 {len(eligible)} 个，按匹配度排序：")
+    by_name = {r.name: r for r in RULES}
+    for sch in top_k(profile, eligible):
+        rule = by_name[sch["name"]]
+        print(f"  {score(rule, profile):5.2f}  (等级 {tier_of(sch)})  {sch['name']}")
+
+    for n in (300, 3000):
+        rules = engine.compile_rules(synth_catalogue(n))
+        matched = engine.match(profile, rules)
+        top_k(profile, matched, rules, 10)  # 先建好 _rule_table
+        for label, k in (("top 10", 10), ("完整排序", None)):
+            t0 = time.perf_counter()
+            for _ in range(100):
+                top_k(profile, matched, rules, k)
+            elapsed = (time.perf_counter() - t0) / 100 * 1e6
+            print(f"目录 {n} 个 / 符合 {len(matched)} 个，{label}：{elapsed:.0f} µs")
@@ -0,0 +1,200 @@
+"""
+结果卡片渲染：所有卡片 + 标签 + 官网链接合成一段 HTML，一次 st.markdown 发送
+
+以前每个奖学金要发 3 个前端元素 (卡片 markdown + link_button + 间隔 markdown)，
+成绩好的学生 20+ 个匹配就是 60+ 条消息。卡片内容只取决于奖学金本身，
+所以整张卡片在第一次用到时渲染并缓存，之后每次分析只需要拼接字符串。
+
+运行 `python render.py` 可以看到节省的消息数与字节数。
+"""
+import html
+import json
+from string import Template
+
+from cache import LRUCache
+from pathways import LEVEL_LABELS
+
+# --- 1. 模板 (进程内只编译一次) ---
+# 注意：不能有缩进或空行，否则 Markdown 会把 HTML 当成代码块
+CARD_TEMPLATE = Template(
+    '<div class="scholarship-card">'
+    '<div style="display:flex; justify-content:space-between; align-items:center;">'
+    '<h3 style="margin:0; color:#1F2937;">$name</h3>'
+    '<span class="status-pass">✅ 符合资格</span>'
+    '</div>'
+    '<p style="color:#6B7280; font-size:14px; margin-top:5px;">$provider</p>'
+    '<div style="margin: 10px 0;">$tags</div>'
+    '<p>$desc</p>'
+    '$info'
+    '$link'
+    '</div>'
+)
+TAG_TEMPLATE = Template("<span class='tag'>$tag</span>")
+FIELD_ONLY_TEMPLATE = Template("<div class='info-text'><span class='field-tag'>🎯 指定科系:</span> $field</div>")
+FIELD_BLOCK_TEMPLATE = Template("<div class='info-text'><span class='block-tag'>⛔ 不含科系:</span> $field</div>")
+B40_HTML = "<div class='info-text'><span class='b40-tag'>💡 B40 群体优先</span></div>"
+LINK_TEMPLATE = Template('<a class="verify-link" href="$link" target="_blank" rel="noopener">🔗 官网核实 (Verify)</a>')
+
+# “差一点”卡片：升级方案取决于学生，不缓存
+NEAR_MISS_TEMPLATE = Template(
+    '<div class="scholarship-card near-miss">'
+    '<div style="display:flex; justify-content:space-between; align-items:center;">'
+    '<h3 style="margin:0; color:#1F2937;">$name</h3>'
+    '<span class="status-near">🎯 还差 $count 科</span>'
+    '</div>'
+    '<p style="color:#6B7280; font-size:14px; margin-top:5px;">$provider</p>'
+    '$upgrades'
+    '$link'
+    '</div>'
+)
+UPGRADE_TEMPLATE = Template("<div class='info-text'><span class='upgrade-tag'>📈 $subject</span> $from_grade → <b>$to_grade</b></div>")
+
+# 本地升学路径建议 (见 pathways.py)：每次分析只有五行，不缓存
+PATHWAY_BOX_TEMPLATE = Template(
+    '<div class="pathway-box">'
+    '<p>$summary</p>'
+    '$rows'
+    '</div>'
+)
+PATHWAY_ROW_TEMPLATE = Template(
+    '<div class="pathway-row $level">'
+    '<span class="pathway-level">$label</span> <b>$name</b> <span class="pathway-note">$note</span>'
+    '<div class="info-text">$reasons</div>'
+    '</div>'
+)
+
+_esc = html.escape
+
+# 名字 -> (原始条目, 渲染好的卡片)；条目对象换了 (例如目录重新加载) 就重新渲染。
+# 有上限的 LRU：热更新后被删除 / 改名的条目不会一直留在内存里
+CARD_CACHE_SIZE = 4096
+_card_cache = LRUCache(CARD_CACHE_SIZE)
+
+
+# --- 2. 渲染 ---
+
+def _render_card(sch):
+    info = ""
+    if "field_only" in sch:
+        info += FIELD_ONLY_TEMPLATE.substitute(field=_esc(sch['field_only']))
+    if "field_block" in sch:
+        info += FIELD_BLOCK_TEMPLATE.substitute(field=_esc(sch['field_block']))
+    if sch.get("income_req") == "B40":
+        info += B40_HTML
+    link = LINK_TEMPLATE.substitute(link=_esc(sch['link'])) if "link" in sch else ""
+    return CARD_TEMPLATE.substitute(
+        name=_esc(sch['name']),
+        provider=_esc(sch['provider']),
+        tags="".join(TAG_TEMPLATE.substitute(tag=_esc(t)) for t in sch['tags']),
+        desc=_esc(sch['desc']),
+        info=info,
+        link=link,
+    )
+
+
+def card_html(sch):
+    cached = _card_cache.get(sch['name'])
+    if cached is None or cached[0] is not sch:
+        cached = (sch, _render_card(sch))
+        _card_cache.put(sch['name'], cached)
+    return cached[1]
+
+
+def prerender(db):
+    """启动时预先渲染整个数据库的卡片"""
+    for sch in db:
+        card_html(sch)
+
+
+def render_cards(schs):
+    """所有符合资格的卡片合成一个 HTML 字符串"""
+    return "".join(card_html(sch) for sch in schs)
+
+
+def render_near_misses(misses):
+    """whatif.NearMiss 列表合成一个 HTML 字符串"""
+    cards = []
+    for m in misses:
+        sch = m.sch
+        cards.append(NEAR_MISS_TEMPLATE.substitute(
+            name=_esc(sch['name']),
+            provider=_esc(sch['provider']),
+            count=len(m.upgrades),
+            upgrades="".join(
+                UPGRADE_TEMPLATE.substitute(subject=_esc(u.subject), from_grade=_esc(u.from_grade),
+                                            to_grade=_esc(u.to_grade))
+                for u in m.upgrades
+            ),
+            link=LINK_TEMPLATE.substitute(link=_esc(sch['link'])) if "link" in sch else "",
+        ))
+    return "".join(cards)
+
+
+def render_pathways(advice):
+    """pathways.PathwayAdvice 合成一个 HTML 字符串"""
+    rows = "".join(
+        PATHWAY_ROW_TEMPLATE.substitute(
+            level=f.level, label=LEVEL_LABELS[f.level], name=_esc(f.name), note=_esc(f.note),
+            reasons="；".join(_esc(r) for r in f.reasons),
+        )
+        for f in advice.fits
+    )
+    return PATHWAY_BOX_TEMPLATE.substitute(summary=_esc(advice.summary), rows=rows)
+
+
+# --- 3. 测量 ---
+
+def _legacy_messages(sch):
+    """重现旧版每张卡片发送的 3 个元素 (卡片 markdown、link_button、间隔 markdown)"""
+    tags_html = "".join([f"<span class='tag'>{t}</span>" for t in sch['tags']])
+    info_html = ""
+    if "field_only" in sch:
+        info_html += f"<div class='info-text'><span class='field-tag'>🎯 指定科系:</span> {sch['field_only']}</div>"
+    if "field_block" in sch:
+        info_html += f"<div class='info-text'><span class='block-tag'>⛔ 不含科系:</span> {sch['field_block']}</div>"
+    if sch.get("income_req") == "B40":
+        info_html += B40_HTML
+    card = f"""
+            <div class="scholarship-card">
+                <div style="display:flex; justify-content:space-between; align-items:center;">
+                    <h3 style="margin:0; color:#1F2937;">{sch['name']}</h3>
+                    <span class="status-pass">✅ 符合资格</span>
+                </div>
+                <p style="color:#6B7280; font-size:14px; margin-top:5px;">{sch['provider']}</p>
+                <div style="margin: 10px 0;">{tags_html}</div>
+                <p>{sch['desc']}</p>
+                {info_html}
+            </div>
+            """
+    messages = [card]
+    if "link" in sch:
+        messages.append(json.dumps({"label": "🔗 官网核实 (Verify)", "url": sch['link']}, ensure_ascii=False))
+    messages.append("<div style='margin-bottom: 20px;'></div>")
+    return messages
+
+
+def payload_stats(schs):
+    """对比旧版与新版的前端消息数和正文字节数 (不含 Streamlit 协议本身的开销)"""
+    legacy = [m for sch in schs for m in _legacy_messages(sch)]
+    single = render_cards(schs)
+    return {
+        "cards": len(schs),
+        "legacy_messages": len(legacy),
+        "legacy_bytes": sum(len(m.encode("utf-8")) for m in legacy),
+        "messages": 1 if schs else 0,
+        "bytes": len(single.encode("utf-8")),
+    }
+
+
+if __name__ == "__main__":
+    import engine
+
+    top = engine.make_profile(
+        {s: "A+" for s in ["Bahasa Melayu", "Bahasa Inggeris", "Sejarah", "Matematik",
+                           "Matematik Tambahan", "Fizik", "Kimia", "Biologi", "Pendidikan Moral"]},
+        "Selangor", is_muslim=True, is_bumi=True, koko=10.0,
+    )
+    stats = payload_stats(engine.match(top))
+    print(f"全 A+ 学生：{stats['cards']} 张卡片")
+    print(f"  旧版：{stats['legacy_messages']} 条消息，{stats['legacy_bytes']:,} bytes")
+    print(f"  新版：{stats['messages']} 条消息，{stats['bytes']:,} bytes")
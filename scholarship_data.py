@@ -0,0 +1,189 @@
+"""
+SPM 奖学金基础数据 (州属 / 科目 / 等级 / 奖学金数据库)
+
+州属、科目和奖学金条目放在 data/scholarships.json (或环境变量 SPM_CATALOGUE 指定的文件)，
+修改条件不需要改代码。读取时做结构校验，条目冻结成只读结构。
+等级表是匹配引擎的序数基础，仍然写在代码里。
+
+纯数据模块，不依赖 Streamlit，可被 app.py、匹配引擎和批处理脚本共同导入。
+这里的 STATE_LIST / SUBJECT_LIST / SCHOLARSHIP_DB 是进程启动时的快照；
+需要热更新的地方 (app.py) 用 catalog.py 的 CatalogStore。
+"""
+import json
+import os
+from types import MappingProxyType
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOGUE_PATH = os.environ.get("SPM_CATALOGUE", os.path.join(BASE_DIR, "data", "scholarships.json"))
+
+GRADE_OPTIONS = ["-- 请选择 --", "A+", "A", "A-", "B+", "B", "C+", "C", "D", "E", "G"]
+GRADES = GRADE_OPTIONS[1:]
+
+# 条目类型：奖学金 / 贷学金 / 大学课程；不写时视为奖学金
+KINDS = ("scholarship", "loan", "program")
+
+# koko_marks 必须是 KOKO_STEP 的倍数：建议缓存按这个步长给 Koko 分段 (见 cache.koko_bucket)，
+# 门槛落在段内 (例如 7.3) 会让资格不同的两个学生共用一条缓存
+KOKO_STEP = 0.5
+
+# 会话里的科目下标存在 array("H") 里 (见 session_rows.py)，下标 0 留给“请选择”
+MAX_SUBJECTS = 65534
+
+# 声望等级：1 = 顶尖 (全额出国 / 精英计划)，2 = 主流，3 = 一般；不写时由 ranking.py 按门槛推算
+TIERS = (1, 2, 3)
+
+
+class CatalogueError(ValueError):
+    """数据文件不符合结构要求；errors 列出所有问题"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("奖学金数据文件校验失败：\n" + "\n".join(f"- {e}" for e in self.errors))
+
+
+# --- 1. 结构校验 ---
+
+# 字段 -> (类型, 是否必填)
+_NUMBER = (int, float)
+SCHOLARSHIP_FIELDS = {
+    "name": (str, True),
+    "provider": (str, True),
+    "kind": (str, False),
+    "tier": (int, False),
+    "tags": (list, True),
+    "min_A_total": (int, True),
+    "allow_A_minus": (bool, True),
+    "count_A_minus": (bool, False),   # A 的数量是否含 A-；不写时同 allow_A_minus
+    "min_A_plus": (int, True),
+    "hard_req": (dict, True),
+    "must_all_A_minus": (bool, False),
+    "koko_marks": (_NUMBER, True),
+    "state_req": (str, True),
+    "muslim_req": (bool, True),
+    "bumi_req": (bool, True),
+    "income_req": (str, False),
+    "field_only": (str, False),
+    "field_block": (str, False),
+    "desc": (str, True),
+    "link": (str, False),
+}
+
+
+def _is_type(value, types):
+    # bool 是 int 的子类，数字字段不接受 true/false
+    if isinstance(value, bool) and types is not bool:
+        return False
+    return isinstance(value, types)
+
+
+def _check_scholarship(i, sch, states, subjects):
+    where = f"scholarships[{i}]"
+    if not isinstance(sch, dict):
+        return [f"{where} 必须是对象"]
+    where = f"{where} ({sch.get('name', '?')})"
+    errors = []
+    for key in sch:
+        if key not in SCHOLARSHIP_FIELDS:
+            errors.append(f"{where} 未知字段 {key!r}")
+    for key, (types, required) in SCHOLARSHIP_FIELDS.items():
+        if key not in sch:
+            if required:
+                errors.append(f"{where} 缺少字段 {key!r}")
+        elif not _is_type(sch[key], types):
+            errors.append(f"{where} 字段 {key!r} 类型错误")
+    if errors:
+        return errors
+
+    if not sch["name"].strip():
+        errors.append(f"{where} name 不能为空")
+    if not all(isinstance(t, str) for t in sch["tags"]):
+        errors.append(f"{where} tags 必须是字符串列表")
+    for key in ("min_A_total", "min_A_plus"):
+        if sch[key] < 0:
+            errors.append(f"{where} {key} 不能为负数")
+    if not 0 <= sch["koko_marks"] <= 10:
+        errors.append(f"{where} koko_marks 必须在 0-10 之间")
+    elif sch["koko_marks"] / KOKO_STEP != int(sch["koko_marks"] / KOKO_STEP):
+        errors.append(f"{where} koko_marks 必须是 {KOKO_STEP} 的倍数")
+    if sch.get("kind", KINDS[0]) not in KINDS:
+        errors.append(f"{where} kind 必须是 {'/'.join(KINDS)} 之一")
+    if "tier" in sch and sch["tier"] not in TIERS:
+        errors.append(f"{where} tier 必须是 {'/'.join(map(str, TIERS))} 之一")
+    if sch["state_req"] != "All" and sch["state_req"] not in states:
+        errors.append(f"{where} state_req {sch['state_req']!r} 不在 states 列表中")
+    for sub, grades in sch["hard_req"].items():
+        if sub not in subjects:
+            errors.append(f"{where} hard_req 科目 {sub!r} 不在 subjects 列表中")
+        if not isinstance(grades, list) or not grades:
+            errors.append(f"{where} hard_req[{sub!r}] 必须是非空等级列表")
+        elif any(g not in GRADES for g in grades):
+            errors.append(f"{where} hard_req[{sub!r}] 含有无效等级")
+    return errors
+
+
+def validate_catalogue(raw):
+    """返回问题列表；空列表表示通过"""
+    if not isinstance(raw, dict):
+        return ["顶层必须是对象"]
+    errors = []
+    for key in ("states", "subjects", "scholarships"):
+        if not isinstance(raw.get(key), list):
+            errors.append(f"缺少列表字段 {key!r}")
+    if errors:
+        return errors
+
+    states, subjects = raw["states"], raw["subjects"]
+    for key, values in (("states", states), ("subjects", subjects)):
+        if not all(isinstance(v, str) and v for v in values):
+            errors.append(f"{key} 必须是非空字符串列表")
+        elif len(set(values)) != len(values):
+            errors.append(f"{key} 有重复项")
+    if len(subjects) > MAX_SUBJECTS:
+        errors.append(f"subjects 最多 {MAX_SUBJECTS} 个")
+
+    seen = set()
+    for i, sch in enumerate(raw["scholarships"]):
+        errors.extend(_check_scholarship(i, sch, set(states), set(subjects)))
+        name = sch.get("name") if isinstance(sch, dict) else None
+        if name in seen:
+            errors.append(f"scholarships[{i}] 名称重复：{name}")
+        seen.add(name)
+    return errors
+
+
+# --- 2. 读取 + 冻结 ---
+
+def _freeze(sch):
+    """条目在各会话之间共享，冻结成只读结构，避免被某个会话意外修改"""
+    sch = dict(sch)
+    sch["tags"] = tuple(sch["tags"])
+    sch["hard_req"] = MappingProxyType({sub: tuple(g) for sub, g in sch["hard_req"].items()})
+    return MappingProxyType(sch)
+
+
+def parse_catalogue(raw):
+    """校验并返回 (states, subjects, scholarships)，都是 tuple"""
+    errors = validate_catalogue(raw)
+    if errors:
+        raise CatalogueError(errors)
+    return (
+        tuple(raw["states"]),
+        tuple(raw["subjects"]),
+        tuple(_freeze(sch) for sch in raw["scholarships"]),
+    )
+
+
+def read_catalogue(path=CATALOGUE_PATH):
+    with open(path, encoding="utf-8") as f:
+        try:
+            raw = json.load(f)
+        except json.JSONDecodeError as e:
+            raise CatalogueError([f"JSON 格式错误：{e}"]) from None
+    return parse_catalogue(raw)
+
+
+# --- 3. 启动快照 ---
+_states, _subjects, _db = read_catalogue()
+STATE_LIST = list(_states)
+SUBJECT_LIST = list(_subjects)
+SCHOLARSHIP_DB = list(_db)
@@ -0,0 +1,146 @@
+"""
+科目表格的会话状态 (不依赖 Streamlit)
+
+每个会话都常驻服务器内存，几千个会话同时在线时，每行状态的大小决定了一台服务器能承载多少人。
+- SubjectRows 用三个定长数组保存每行的 (行号, 科目下标, 等级下标)：行号是会话内递增的小整数，
+  科目 / 等级是共享选项表里的下标，每个会话不再各自保存 dict、uuid 字符串和科目名
+- 控件 key 为 sub_<行号> / grade_<行号> / del_<行号>；删除行时连同控件 key 一起删除，
+  orphan_widget_keys() 找出其他原因遗留的孤儿 key (例如旧版本的 uuid 行号)
+- session_memory() 估算一个会话 session_state 的大小，用于侧边栏报告和指标
+"""
+import sys
+from array import array
+from functools import lru_cache
+
+from scholarship_data import GRADE_OPTIONS
+
+PLACEHOLDER = GRADE_OPTIONS[0]
+WIDGET_PREFIXES = ("sub_", "grade_", "del_")
+_GRADE_INDEX = {g: i for i, g in enumerate(GRADE_OPTIONS)}
+
+
+@lru_cache(maxsize=4)
+def _subject_index(subjects):
+    """科目名 -> 下标 (0 是“请选择”)；每个目录版本只建一次，所有会话共享"""
+    return {s: i for i, s in enumerate((PLACEHOLDER,) + subjects)}
+
+
+def widget_keys(row_id):
+    return tuple(f"{prefix}{row_id}" for prefix in WIDGET_PREFIXES)
+
+
+class SubjectRows:
+    """一个会话的科目表格；subjects 是目录里的科目 tuple (共享，不复制)"""
+
+    __slots__ = ("subjects", "ids", "subject_idx", "grade_idx", "next_id")
+
+    def __init__(self, subjects, rows=()):
+        self.subjects = subjects
+        self.ids = array("I")
+        self.subject_idx = array("H")      # 科目表可能超过 255 个 (上限见 MAX_SUBJECTS)
+        self.grade_idx = array("B")
+        self.next_id = 0
+        for subject, grade in rows:
+            self.add(subject, grade)
+
+    # --- 读写 ---
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        """按顺序产出 (行号, 科目, 等级)"""
+        for row_id, s, g in zip(self.ids, self.subject_idx, self.grade_idx):
+            yield row_id, self.subject(s), GRADE_OPTIONS[g]
+
+    def subject(self, idx):
+        return self.subjects[idx - 1] if idx else PLACEHOLDER
+
+    def add(self, subject=PLACEHOLDER, grade=PLACEHOLDER):
+        row_id = self.next_id
+        self.next_id += 1
+        self.ids.append(row_id)
+        self.subject_idx.append(_subject_index(self.subjects).get(subject, 0))
+        self.grade_idx.append(_GRADE_INDEX.get(grade, 0))
+        return row_id
+
+    def delete(self, row_id):
+        try:
+            pos = self.ids.index(row_id)
+        except ValueError:
+            return False
+        for column in (self.ids, self.subject_idx, self.grade_idx):
+            del column[pos]
+        return True
+
+    def set(self, pos, subject, grade):
+        """界面上的值同步回第 pos 行；不认识的值当作未选择"""
+        self.subject_idx[pos] = _subject_index(self.subjects).get(subject, 0)
+        self.grade_idx[pos] = _GRADE_INDEX.get(grade, 0)
+
+    def rebase(self, subjects):
+        """目录热更新后科目表变了：按科目名重新映射下标，已删除的科目变回未选择"""
+        if subjects is self.subjects:
+            return
+        old = [self.subject(i) for i in self.subject_idx]
+        self.subjects = subjects
+        index = _subject_index(subjects)
+        self.subject_idx = array("H", (index.get(s, 0) for s in old))
+
+    # --- 给匹配逻辑 ---
+
+    def selected_subjects(self):
+        return {self.subject(i) for i in self.subject_idx if i}
+
+    def grades(self):
+        """去掉未选择的行，重复科目以最后一行为准 (与原来清洗 rows 的规则相同)"""
+        return {
+            self.subject(s): GRADE_OPTIONS[g]
+            for s, g in zip(self.subject_idx, self.grade_idx) if s and g
+        }
+
+
+def orphan_widget_keys(keys, rows):
+    """不属于任何现有行的 sub_ / grade_ / del_ 控件 key"""
+    live = {str(row_id) for row_id in rows.ids}
+    return [
+        key for key in keys
+        if isinstance(key, str) and key.startswith(WIDGET_PREFIXES) and key.split("_", 1)[1] not in live
+    ]
+
+
+# --- 内存报告 ---
+
+def _deep_sizeof(obj, seen):
+    """递归估算对象大小；seen 里的对象 (包括共享的选项表) 不重复计算"""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+
+def session_memory(state, subjects=()):
+    """返回 {"total_bytes", "keys", "widget_keys", "orphans", "by_key": {key: bytes}}；
+    科目 / 等级选项字符串由所有会话共享，不计入"""
+    seen = {id(s) for s in subjects}
+    seen.update(id(g) for g in GRADE_OPTIONS)
+    seen.add(id(subjects))
+    keys = list(state.keys())
+    by_key = {key: _deep_sizeof(key, seen) + _deep_sizeof(state[key], seen) for key in keys}
+    rows = state.get("rows")
+    return {
+        "total_bytes": sum(by_key.values()),
+        "keys": len(keys),
+        "widget_keys": sum(1 for key in keys if isinstance(key, str) and key.startswith(WIDGET_PREFIXES)),
+        "orphans": len(orphan_widget_keys(keys, rows)) if isinstance(rows, SubjectRows) else 0,
+        "by_key": by_key,
+    }
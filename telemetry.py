@@ -0,0 +1,256 @@
+"""
+运行时埋点：计时 span、计数器、直方图，导出为 Prometheus 文本格式
+
+- span("match")：记录耗时到 spm_span_seconds{span="match"} 直方图；
+  开启 SPM_TRACE_LOG 时再写一行 JSON 到追踪日志 (同一次重跑共享 trace_id)
+- inc() / observe()：自定义计数器与直方图 (AI 延迟、token 用量、缓存命中等)
+- register_collector()：导出时再读取的即时数值 (调度器队列长度、缓存大小等)
+
+导出方式 (环境变量，都不设置时只在内存里累计)：
+    SPM_METRICS_FILE=/var/lib/spm/metrics.prom   每 15 秒写一次文件 (node_exporter textfile)
+    SPM_METRICS_PORT=9464                        本地 HTTP 端点 /metrics
+    SPM_TRACE_LOG=/var/log/spm/trace.jsonl       JSON 追踪日志
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+_trace_id = contextvars.ContextVar("spm_trace_id", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                    for k, v in items)
+    return "{" + body + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}      # name -> {labels: value}
+        self.histograms = {}    # name -> {labels: _Histogram}
+        self.help = {}
+        self._collectors = []
+
+    def inc(self, name, value=1, help="", **labels):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+            self.help.setdefault(name, help)
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, help="", **labels):
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            key = _label_key(labels)
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(buckets)
+            hist.observe(value)
+            self.help.setdefault(name, help)
+
+    def register_collector(self, fn):
+        """fn() 返回 [(name, labels_dict, value), ...]，导出时调用"""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                if self.help.get(name):
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                if self.help.get(name):
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist.total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+            collectors = list(self._collectors)
+
+        gauges = {}
+        for fn in collectors:
+            try:
+                for name, labels, value in fn():
+                    gauges.setdefault(name, []).append((_label_key(labels), value))
+            except Exception:
+                continue
+        for name, series in sorted(gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in series:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+register_collector = REGISTRY.register_collector
+
+
+# --- 追踪 ---
+
+class _TraceLog:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+_trace_log = None
+
+
+def new_trace():
+    """每次脚本重跑开始时调用，之后的 span 共享同一个 trace_id"""
+    trace_id = uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+@contextmanager
+def span(name, **attrs):
+    """计时一个代码段；attrs 只写进追踪日志，不作为指标标签 (避免高基数)"""
+    started = time.perf_counter()
+    wall = time.time()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        observe("spm_span_seconds", duration, help="Duration of instrumented app sections", span=name)
+        if _trace_log is not None:
+            _trace_log.write({
+                "trace_id": _trace_id.get(), "span": name, "start": wall,
+                "duration_ms": round(duration * 1000, 3), "error": error, **attrs,
+            })
+
+
+def event(name, **attrs):
+    """不计时的追踪事件 (例如 token 用量)；没有开启追踪日志时什么也不做"""
+    if _trace_log is not None:
+        _trace_log.write({"trace_id": _trace_id.get(), "event": name, "time": time.time(), **attrs})
+
+
+def record_ai_usage(usage):
+    """把 DeepSeek 响应里的 usage 记进 token 计数器 (每次上游调用记一次)"""
+    if usage is None:
+        return
+    inc("spm_ai_tokens_total", usage.prompt_tokens or 0, help="DeepSeek tokens from response usage", kind="prompt")
+    inc("spm_ai_tokens_total", usage.completion_tokens or 0, kind="completion")
+    # DeepSeek 的前缀缓存命中 / 未命中 token (非标准字段，其他兼容服务可能没有)
+    cache_hit = getattr(usage, "prompt_cache_hit_tokens", None)
+    cache_miss = getattr(usage, "prompt_cache_miss_tokens", None)
+    if cache_hit is not None:
+        inc("spm_ai_tokens_total", cache_hit, kind="prompt_cache_hit")
+        inc("spm_ai_tokens_total", cache_miss or 0, kind="prompt_cache_miss")
+        event("ai_usage", prompt_tokens=usage.prompt_tokens, cache_hit_tokens=cache_hit,
+              cache_miss_tokens=cache_miss, completion_tokens=usage.completion_tokens)
+    observe("spm_ai_completion_tokens", usage.completion_tokens or 0, buckets=TOKEN_BUCKETS)
+
+
+# --- 导出 ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def write_metrics_file(path):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp, path)
+
+
+def start_exporters(metrics_file=None, metrics_port=None, trace_log=None, interval=15.0):
+    """根据参数 / 环境变量启动导出；每个进程只应调用一次"""
+    global _trace_log
+    metrics_file = metrics_file or os.environ.get("SPM_METRICS_FILE")
+    metrics_port = metrics_port or os.environ.get("SPM_METRICS_PORT")
+    trace_log = trace_log or os.environ.get("SPM_TRACE_LOG")
+    started = {}
+
+    if trace_log:
+        _trace_log = _TraceLog(trace_log)
+        started["trace_log"] = trace_log
+
+    if metrics_file:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_metrics_file(metrics_file)
+                except OSError:
+                    pass
+        threading.Thread(target=loop, daemon=True, name="metrics-file").start()
+        atexit.register(write_metrics_file, metrics_file)
+        started["metrics_file"] = metrics_file
+
+    if metrics_port:
+        server = ThreadingHTTPServer(("127.0.0.1", int(metrics_port)), _MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+        started["metrics_port"] = server.server_address[1]
+
+    return started
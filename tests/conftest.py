@@ -0,0 +1,27 @@
+"""
+pytest 配置
+
+项目是平铺的模块 (没有安装成包)，把仓库根目录放进 sys.path，
+这样在任何目录运行 `python -m pytest tests` 都能导入 engine / whatif 等模块。
+随机数据一律用 benchmarks/synth.py 的固定种子生成，失败可以复现。
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from benchmarks.synth import synth_students, to_profile  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def students():
+    """500 个合成考生 (API / 批量格式的原始字典)"""
+    return synth_students(500, seed=7)
+
+
+@pytest.fixture(scope="session")
+def profiles(students):
+    """同一批考生 (engine.Profile)"""
+    return [to_profile(s) for s in students]
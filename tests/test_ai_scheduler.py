@@ -0,0 +1,248 @@
+"""DeepSeek 调度器与 single-flight：对着本地 fake_deepseek (临时端口) 测试"""
+import threading
+import time
+
+import pytest
+
+import ai_pool
+from ai_scheduler import AIScheduler, DeadlineExceeded, Overloaded
+from fake_deepseek import DEFAULT_REPLY, start_fake_server
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def fake():
+    server = start_fake_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(fake):
+    return ai_pool.make_client("test-key", base_url=fake.url)
+
+
+def ask(client):
+    def fn(timeout):
+        response = client.chat.completions.create(model="deepseek-chat", messages=MESSAGES, timeout=timeout)
+        return response.choices[0].message.content
+    return fn
+
+
+def stream(client):
+    def fn(timeout):
+        upstream = client.chat.completions.create(model="deepseek-chat", messages=MESSAGES, stream=True, timeout=timeout)
+        try:
+            for chunk in upstream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            upstream.close()
+    return fn
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+# --- 阻塞调用 ---
+
+def test_call_returns_reply(fake, client):
+    scheduler = AIScheduler()
+    assert scheduler.call(ask(client)) == DEFAULT_REPLY
+    assert scheduler.counters["submitted"] == 1 and fake.requests == 1
+
+
+def test_sheds_when_queue_full(fake, client):
+    fake.latency = 0.5
+    scheduler = AIScheduler(max_workers=1, max_queue=1)
+    threads = [threading.Thread(target=scheduler.call, args=(ask(client),)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    assert wait_until(lambda: scheduler.queued + scheduler.running == 2)
+    with pytest.raises(Overloaded):
+        scheduler.call(ask(client))
+    for t in threads:
+        t.join()
+    assert scheduler.counters["shed"] == 1
+    assert fake.requests == 2
+
+
+def test_deadline_exceeded(fake, client):
+    fake.latency = 1.0
+    scheduler = AIScheduler()
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        scheduler.call(ask(client), deadline=0.3)
+    assert time.monotonic() - started < 0.9
+    assert scheduler.counters["timeouts"] == 1
+
+
+def test_retries_after_503(fake, client):
+    fake.error_rate = 1.0
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        fake.error_rate = 1.0 if len(attempts) == 1 else 0.0
+        return ask(client)(timeout)
+
+    scheduler = AIScheduler(backoff=0.01)
+    assert scheduler.call(flaky) == DEFAULT_REPLY
+    assert len(attempts) == 2 and fake.errors == 1
+    assert scheduler.counters["retries"] == 1 and scheduler.counters["errors"] == 0
+
+
+def test_non_retryable_error_is_not_retried(client):
+    scheduler = AIScheduler(backoff=0.01)
+
+    def broken(timeout):
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.call(broken)
+    assert scheduler.counters["retries"] == 0 and scheduler.counters["errors"] == 1
+
+
+# --- 流式调用 ---
+
+def test_stream_retries_before_first_piece(fake, client):
+    fake.error_rate = 1.0
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        fake.error_rate = 1.0 if len(attempts) == 1 else 0.0
+        return stream(client)(timeout)
+
+    scheduler = AIScheduler(backoff=0.01)
+    assert "".join(scheduler.stream(flaky)) == DEFAULT_REPLY
+    assert scheduler.counters["retries"] == 1 and fake.requests == 2
+
+
+class UpstreamError(Exception):
+    status_code = 503  # 可重试的状态码
+
+
+def test_stream_no_retry_after_first_piece(fake, client):
+    def breaks_midway(timeout):
+        for i, piece in enumerate(stream(client)(timeout)):
+            if i == 3:
+                raise UpstreamError("connection reset")
+            yield piece
+
+    scheduler = AIScheduler(backoff=0.01)
+    received = []
+    with pytest.raises(UpstreamError):
+        for piece in scheduler.stream(breaks_midway):
+            received.append(piece)
+    # 已经输出的内容不会重复：只有一次上游请求
+    assert "".join(received) == DEFAULT_REPLY[:3]
+    assert scheduler.counters["retries"] == 0 and fake.requests == 1
+
+
+def test_failed_attempts_are_closed():
+    """第一个片段之前失败的每次尝试都要关闭上游迭代器 (归还连接)"""
+    closed = []
+
+    class Upstream:
+        def __init__(self, fail):
+            self.fail = fail
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            if self.fail:
+                raise UpstreamError("503")
+            raise StopIteration
+
+        def close(self):
+            closed.append(self)
+
+    attempts = []
+
+    def fn(timeout):
+        attempts.append(Upstream(fail=len(attempts) < 2))
+        return attempts[-1]
+
+    scheduler = AIScheduler(backoff=0.01)
+    assert list(scheduler.stream(fn)) == []
+    assert scheduler.counters["retries"] == 2
+    assert wait_until(lambda: len(closed) == 3)
+    assert {id(u) for u in closed} == {id(u) for u in attempts}
+
+
+def test_stream_cancel_disconnects_upstream(fake, client):
+    fake.token_delay = 0.05
+    cancel = threading.Event()
+    scheduler = AIScheduler()
+    received = []
+    started = None
+    for piece in scheduler.stream(stream(client), cancel=cancel):
+        received.append(piece)
+        if len(received) == 2:
+            cancel.set()
+            started = time.monotonic()
+    assert len(received) < len(DEFAULT_REPLY)
+    assert time.monotonic() - started < 1.0
+    assert wait_until(lambda: scheduler.counters["cancelled"] == 1)
+    assert wait_until(lambda: fake.disconnects == 1)
+    assert wait_until(lambda: scheduler.running == 0)
+
+
+def test_cancelled_before_start_sends_nothing(fake, client):
+    cancel = threading.Event()
+    cancel.set()
+    scheduler = AIScheduler()
+    assert list(scheduler.stream(stream(client), cancel=cancel)) == []
+    assert wait_until(lambda: scheduler.counters["cancelled"] == 1)
+    assert fake.requests == 0
+
+
+# --- single-flight ---
+
+def test_single_flight_coalesces_identical_calls(fake, client):
+    fake.latency = 0.3
+    flights = ai_pool.SingleFlight()
+    scheduler = AIScheduler()
+    results = []
+
+    def worker():
+        results.append(flights.do("same-prompt", lambda: scheduler.call(ask(client))))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [DEFAULT_REPLY] * 4
+    assert fake.requests == 1
+    assert flights.stats() == {"leaders": 1, "coalesced": 3}
+
+
+def test_single_flight_stream_shared_and_abandoned(fake, client):
+    fake.token_delay = 0.02
+    flights = ai_pool.SingleFlight()
+    scheduler = AIScheduler()
+    open_flight = lambda cancel: scheduler.stream(stream(client), cancel=cancel)
+
+    first = flights.watch("k", open_flight)
+    second = flights.watch("k", open_flight)
+    assert first is second and flights.coalesced == 1
+    assert first.wait(10) and first.completed and first.text() == DEFAULT_REPLY
+
+    # 所有订阅者都离开后，上游在下一个片段处断开
+    fake.token_delay = 0.05
+    third = flights.watch("k2", open_flight)
+    assert wait_until(lambda: third.text())
+    third.leave()
+    assert third.wait(5) and not third.completed
+    assert fake.requests == 2
@@ -0,0 +1,103 @@
+"""会话后台 AI 任务：复用、放弃、数量上限、错误摘要 (用桩流代替 DeepSeek)"""
+import threading
+
+import pytest
+
+from ai_pool import SingleFlight
+from ai_tasks import AdviceTask, SessionTasks, TaskError, TooManyTasks
+
+
+class Upstream:
+    """桩上游：先输出一个片段，然后等 release 或 cancel；opened 记录发出的请求数"""
+
+    def __init__(self, pieces=("你好", "，同学"), error=None):
+        self.pieces = pieces
+        self.error = error
+        self.release = threading.Event()
+        self.opened = 0
+        self.flights = SingleFlight()
+
+    def stream(self, cancel):
+        self.opened += 1
+        yield self.pieces[0]
+        while not self.release.wait(0.01):
+            if cancel.is_set():
+                return
+        if self.error is not None:
+            raise self.error
+        yield from self.pieces[1:]
+
+    def opener(self, key):
+        return lambda: self.flights.watch(key, self.stream)
+
+
+@pytest.fixture
+def upstream():
+    upstream = Upstream()
+    yield upstream
+    upstream.release.set()
+
+
+def test_same_key_reuses_task(upstream):
+    tasks = SessionTasks()
+    task = tasks.start("k", upstream.opener("k"))
+    assert tasks.start("k", upstream.opener("k")) is task
+    upstream.release.set()
+    assert task.wait(5) and task.completed and task.text == "你好，同学"
+    assert tasks.start("k", upstream.opener("k")) is task  # 已成功的也复用
+    assert upstream.opened == 1
+
+
+def test_new_key_abandons_old_task(upstream):
+    tasks = SessionTasks()
+    old = tasks.start("k1", upstream.opener("k1"))
+    new = tasks.start("k2", upstream.opener("k2"))
+    assert new is not old and tasks.current is new
+    assert old.abandoned and old.wait(5)
+    assert old.done and not old.completed
+    assert upstream.opened == 2
+
+
+def test_too_many_outstanding_tasks():
+    upstream = Upstream()
+    # 上游不响应 cancel：放弃的任务一直占着名额
+    upstream.stream = lambda cancel: iter(upstream.release.wait, True)
+    tasks = SessionTasks(max_outstanding=3)
+    for key in ("k1", "k2", "k3"):
+        tasks.start(key, upstream.opener(key))
+    assert len(tasks.stale) == 2
+    with pytest.raises(TooManyTasks):
+        tasks.start("k4", upstream.opener("k4"))
+    upstream.release.set()
+    for task in tasks.stale:
+        assert task.wait(5)
+    assert tasks.start("k4", upstream.opener("k4")).key == "k4"
+
+
+def test_error_keeps_only_summary(upstream):
+    class UpstreamError(Exception):
+        def __init__(self, message):
+            super().__init__(message)
+            self.response = b"x" * 50_000  # 模拟引用着整个 HTTP 响应
+
+    upstream.error = UpstreamError("503 Service Unavailable")
+    tasks = SessionTasks()
+    done = []
+    task = tasks.start("k", upstream.opener("k"), on_done=done.append)
+    upstream.release.set()
+    assert task.wait(5)
+    assert task.error == TaskError("UpstreamError", "503 Service Unavailable")
+    assert str(task.error) == "503 Service Unavailable"
+    assert task.flight is None and task.text == "你好" and not task.completed
+    assert done == [task]
+    # 出错的任务不复用：同样的 key 会重新请求
+    retry = tasks.start("k", upstream.opener("k"))
+    assert retry is not task and upstream.opened == 2
+
+
+def test_ttft_is_measured_from_start(upstream):
+    task = AdviceTask("k", upstream.opener("k")())
+    assert task.wait(0.2) is False
+    assert task.ttft is not None and task.ttft >= 0.0
+    task.abandon()
+    assert task.wait(5)
@@ -0,0 +1,114 @@
+"""JSON API：请求校验、批量上限，以及 /match 与 engine.match 一致 (临时端口上的真实服务)"""
+import http.client
+import json
+import threading
+
+import pytest
+
+import engine
+from api_server import MAX_BATCH, ApiServer, RequestError, parse_student
+from benchmarks.synth import synth_students, to_profile
+from catalog import CatalogStore
+
+STUDENT = {"grades": {"Bahasa Melayu": "A+", "Sejarah": "A", "Matematik": "A"},
+           "state": "Selangor", "religion": "Islam", "race": "Bumiputera", "koko": 8.5}
+
+
+@pytest.fixture(scope="module")
+def store():
+    return CatalogStore()
+
+
+@pytest.fixture(scope="module")
+def server(store):
+    server = ApiServer(("127.0.0.1", 0), store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path, body):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        conn.request("POST", path, data, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+# --- 请求解析 ---
+
+def test_parse_student(store):
+    profile, religion, race = parse_student(STUDENT, store.current())
+    assert (religion, race) == ("Islam", "Bumiputera")
+    assert profile.is_muslim and profile.is_bumi and profile.koko == 8.5
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"grades": {}}, "grades 必须是非空对象"),
+    ({"grades": {"Latin": "A"}}, "未知科目"),
+    ({"grades": {"Sejarah": "Z"}}, "无效等级"),
+    ({"state": "Atlantis"}, "未知州属"),
+    ({"religion": "Pastafarian"}, "religion"),
+    ({"race": "Martian"}, "race"),
+    ({"koko": 11}, "koko"),
+    ({"koko": True}, "koko"),
+])
+def test_parse_student_errors(store, changes, message):
+    with pytest.raises(RequestError) as raised:
+        parse_student(dict(STUDENT, **changes), store.current())
+    assert any(message in e for e in raised.value.errors), raised.value.errors
+
+
+def test_parse_student_reports_all_errors(store):
+    with pytest.raises(RequestError) as raised:
+        parse_student({"grades": {"Latin": "A"}, "state": "Atlantis", "koko": -1}, store.current(), where="s")
+    assert len(raised.value.errors) == 3
+    assert all(e.startswith("s.") for e in raised.value.errors)
+
+
+# --- HTTP ---
+
+def test_match_agrees_with_engine(server, store):
+    catalog = store.current()
+    for student in synth_students(50, seed=11):
+        status, body = post(server, "/match", student)
+        assert status == 200
+        expected = [sch["name"] for sch in engine.match(to_profile(student), catalog.rules)]
+        assert [e["name"] for e in body["eligible"]] == expected
+        assert body["count"] == len(expected)
+        assert body["catalogue_version"] == catalog.version
+
+
+def test_match_invalid_student(server):
+    status, body = post(server, "/match", dict(STUDENT, state="Atlantis"))
+    assert status == 400 and body["error"] == "invalid request"
+    status, body = post(server, "/match", b"{not json")
+    assert status == 400 and "JSON" in body["details"][0]
+
+
+def test_batch_isolates_bad_students(server, store):
+    students = synth_students(3, seed=5)
+    status, body = post(server, "/match/batch", {"students": [students[0], {"grades": {}}, students[2]]})
+    assert status == 200
+    first, bad, last = body["results"]
+    assert bad["error"] == "invalid student" and bad["details"][0].startswith("students[1].")
+    for student, result in ((students[0], first), (students[2], last)):
+        assert result["count"] == len(engine.match(to_profile(student), store.current().rules))
+
+
+def test_batch_limit(server):
+    student = synth_students(1, seed=5)[0]
+    status, body = post(server, "/match/batch", {"students": [student] * MAX_BATCH})
+    assert status == 200 and len(body["results"]) == MAX_BATCH
+    status, body = post(server, "/match/batch", {"students": [student] * (MAX_BATCH + 1)})
+    assert status == 400 and str(MAX_BATCH) in body["details"][0]
+
+
+def test_unknown_route(server):
+    status, body = post(server, "/nope", {})
+    assert status == 404
@@ -0,0 +1,35 @@
+"""批量资格矩阵与逐个 engine.match 的差分测试"""
+import pandas as pd
+import pytest
+
+import engine
+from batch import eligibility_matrix, eligible_names, encode_grades
+from benchmarks.synth import synth_catalogue, to_frame
+
+
+@pytest.fixture(scope="module")
+def synth_rules():
+    return engine.compile_rules(synth_catalogue(500, seed=13))
+
+
+def expected_names(profiles, rules):
+    return [[sch["name"] for sch in engine.match(p, rules)] for p in profiles]
+
+
+@pytest.mark.parametrize("which", ["shipped", "synthetic"])
+def test_matrix_agrees_with_engine(students, profiles, synth_rules, which):
+    rules = engine.RULES if which == "shipped" else synth_rules
+    matrix = eligibility_matrix(to_frame(students), rules)
+    assert matrix.shape == (len(students), len(rules))
+    assert eligible_names(matrix) == expected_names(profiles, rules)
+
+
+def test_string_grades_and_flags(students, profiles):
+    """学校导出的 CSV：等级是字符串，身份栏位是文字"""
+    rows = []
+    for s in students[:100]:
+        row = dict(s["grades"])
+        row.update(state=s["state"], bumi=s["race"], muslim=s["religion"], koko=str(s["koko"]))
+        rows.append(row)
+    matrix = eligibility_matrix(encode_grades(pd.DataFrame(rows)))
+    assert eligible_names(matrix) == expected_names(profiles[:100], engine.RULES)
@@ -0,0 +1,117 @@
+"""建议缓存：缓存键的规范化、两层命中、TTL 与淘汰"""
+import types
+
+import pytest
+
+import cache
+from cache import AdviceCache, LRUCache, advice_key
+
+GRADES = {"Bahasa Melayu": "A", "Sejarah": "A-", "Matematik": "A+", "Fizik": "B+"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def advice(tmp_path, clock):
+    store = AdviceCache(tmp_path / "advice.sqlite3", memory_size=4, max_rows=150, ttl=100)
+    yield store
+    store._db.close()
+
+
+def key(**changes):
+    args = dict(user_grades=GRADES, state="Selangor", religion="Islam", race="Melayu",
+                koko=8.7, wish="想读医科", catalogue="v1")
+    args.update(changes)
+    return advice_key(**args)
+
+
+# --- 缓存键 ---
+
+def test_key_ignores_formatting():
+    reordered = dict(reversed(list(GRADES.items())))
+    assert key() == key(user_grades=reordered)
+    assert key() == key(wish="  想读医科。 ")
+    assert key(wish="I want Medicine") == key(wish="i  WANT medicine!")
+    assert key(koko=8.7) == key(koko=8.5)  # 同一个 Koko 分段
+
+
+def test_key_changes_with_inputs():
+    assert key(koko=8.5) != key(koko=9.0)
+    assert key(catalogue="v1") != key(catalogue="v2")
+    assert key(wish="想读医科") != key(wish="想读工程")
+    assert key() != key(user_grades=dict(GRADES, Fizik="A"))
+
+
+# --- 两层缓存 ---
+
+def test_memory_then_disk_hit(advice):
+    advice.put("k", "建议")
+    assert advice.get("k") == "建议"
+    assert advice.stats()["memory_hits"] == 1
+
+    advice.memory = LRUCache(4, advice.ttl)  # 模拟进程重启：内存层清空
+    assert advice.get("k") == "建议"
+    assert advice.get("k") == "建议"  # 已提升回内存层
+    stats = advice.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+    assert advice.get("missing") is None and advice.stats()["misses"] == 1
+
+
+def test_ttl_expiry(advice, clock):
+    advice.put("k", "建议")
+    clock.now += 99
+    assert advice.get("k") == "建议"
+    clock.now += 2
+    assert advice.get("k") is None
+    advice.memory = LRUCache(4, advice.ttl)
+    assert advice.get("k") is None  # 磁盘层同样过期
+
+
+def test_disk_hit_keeps_original_timestamp(advice, clock):
+    """从磁盘提升到内存时沿用写入时间，TTL 不会被延长"""
+    advice.put("k", "建议")
+    advice.memory = LRUCache(4, advice.ttl)
+    clock.now += 60
+    assert advice.get("k") == "建议"
+    clock.now += 60
+    assert advice.get("k") is None
+
+
+def test_memory_eviction():
+    lru = LRUCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1  # a 变成最近使用
+    lru.put("c", 3)
+    assert lru.get("b") is None and lru.get("a") == 1 and lru.get("c") == 3
+    assert lru.stats()["evictions"] == 1
+
+
+def test_disk_eviction_keeps_recently_used(advice, clock):
+    advice.put("old", "x")
+    clock.now += 1
+    advice.put("hot", "y")
+    for i in range(198):
+        clock.now += 0.01
+        if i == 50:
+            advice.memory = LRUCache(4, advice.ttl)
+            assert advice.get("hot") == "y"  # 更新 accessed
+        advice.put(f"k{i}", str(i))
+    (rows,) = advice._db.execute("SELECT COUNT(*) FROM advice").fetchone()
+    assert rows == advice.max_rows
+    advice.memory = LRUCache(4, advice.ttl)
+    assert advice.get("old") is None
+    assert advice.get("hot") == "y"
@@ -0,0 +1,83 @@
+"""目录文件校验与热更新"""
+import copy
+import json
+import os
+
+import pytest
+
+from catalog import CatalogStore, load_catalog
+from scholarship_data import CATALOGUE_PATH, CatalogueError, validate_catalogue
+
+
+@pytest.fixture(scope="module")
+def raw():
+    with open(CATALOGUE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _broken(raw, **changes):
+    data = copy.deepcopy(raw)
+    data["scholarships"][0].update(changes)
+    return validate_catalogue(data)
+
+
+def test_shipped_catalogue_is_valid(raw):
+    assert validate_catalogue(raw) == []
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"colour": "red"}, "未知字段"),
+    ({"min_A_total": "9"}, "类型错误"),
+    ({"min_A_total": True}, "类型错误"),
+    ({"count_A_minus": "yes"}, "类型错误"),
+    ({"koko_marks": 11}, "0-10"),
+    ({"koko_marks": 7.3}, "0.5 的倍数"),
+    ({"kind": "grant"}, "kind"),
+    ({"tier": 4}, "tier"),
+    ({"state_req": "Atlantis"}, "state_req"),
+    ({"hard_req": {"Fizik": ["A", "Z"]}}, "无效等级"),
+    ({"hard_req": {"Latin": ["A"]}}, "不在 subjects"),
+])
+def test_invalid_entries_are_reported(raw, changes, message):
+    errors = _broken(raw, **changes)
+    assert errors and any(message in e for e in errors), errors
+
+
+def test_duplicate_names(raw):
+    data = copy.deepcopy(raw)
+    data["scholarships"].append(copy.deepcopy(data["scholarships"][0]))
+    assert any("名称重复" in e for e in validate_catalogue(data))
+
+
+def _write(path, data, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.utime(path, (mtime, mtime))
+
+
+def test_hot_reload(raw, tmp_path):
+    path = str(tmp_path / "scholarships.json")
+    _write(path, raw, 1_000_000)
+    store = CatalogStore(path, check_interval=0)
+    first = store.current()
+    assert len(first.db) == len(raw["scholarships"])
+
+    # 文件没变：同一个快照
+    assert store.current() is first
+
+    # 改了条件：重新加载，新版本
+    changed = copy.deepcopy(raw)
+    changed["scholarships"] = changed["scholarships"][:5]
+    _write(path, changed, 1_000_100)
+    second = store.current()
+    assert second is not first and len(second.db) == 5
+    assert second.version != first.version and store.reloads == 1
+
+    # 写坏了：继续用旧版本并记录错误
+    bad = copy.deepcopy(changed)
+    bad["scholarships"][0]["koko_marks"] = 7.3
+    _write(path, bad, 1_000_200)
+    assert store.current() is second
+    assert "0.5 的倍数" in store.last_error
+    with pytest.raises(CatalogueError):
+        load_catalog(path)
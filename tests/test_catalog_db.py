@@ -0,0 +1,59 @@
+"""SQLite 目录查询与 engine.match 的差分测试"""
+import pytest
+
+import engine
+from benchmarks.synth import synth_catalogue
+from catalog_db import CatalogDB
+from scholarship_data import SCHOLARSHIP_DB
+
+
+def load(db):
+    store = CatalogDB()
+    store.load(db)
+    return store
+
+
+@pytest.fixture(scope="module")
+def shipped():
+    store = load(SCHOLARSHIP_DB)
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    db = synth_catalogue(2000, seed=17)
+    store = load(db)
+    yield store, engine.compile_rules(db)
+    store.close()
+
+
+def names(entries):
+    return [sch["name"] for sch in entries]
+
+
+def test_shipped_catalogue_agrees_with_engine(shipped, profiles):
+    assert shipped.count() == len(SCHOLARSHIP_DB)
+    for p in profiles:
+        assert names(shipped.eligible(p)) == names(engine.match(p))
+
+
+def test_synthetic_catalogue_agrees_with_engine(synthetic, profiles):
+    store, rules = synthetic
+    assert store.count() == len(rules)
+    for p in profiles[:200]:
+        assert names(store.eligible(p)) == names(engine.match(p, rules))
+
+
+def test_filters_narrow_engine_result(synthetic, profiles):
+    store, rules = synthetic
+    for p in profiles[:50]:
+        matched = engine.match(p, rules)
+        assert names(store.eligible(p, kind="loan")) == [
+            sch["name"] for sch in matched if sch.get("kind", "scholarship") == "loan"]
+        assert names(store.eligible(p, tags=["海外"])) == [sch["name"] for sch in matched if "海外" in sch["tags"]]
+
+
+def test_loaded_entries_are_returned_as_is(shipped, profiles):
+    eligible = shipped.eligible(profiles[0])
+    assert all(any(sch is entry for entry in SCHOLARSHIP_DB) for sch in eligible)
@@ -0,0 +1,56 @@
+"""匹配引擎：位图预筛选 + 规范化资料键，与逐条判定的朴素匹配对照"""
+import pytest
+
+import engine
+from benchmarks.synth import synth_catalogue
+from cache import MatchMemo
+
+
+def naive_match(profile, rules):
+    return [r.sch for r in rules if engine.passes(r, profile)]
+
+
+@pytest.fixture(scope="module", params=["real", "synth"])
+def rules(request):
+    if request.param == "real":
+        return engine.RULES
+    return engine.compile_rules(synth_catalogue(400, seed=11))
+
+
+def test_bitset_match_equals_naive(rules, profiles):
+    for p in profiles:
+        assert engine.match(p, rules) == naive_match(p, rules)
+
+
+def test_failures_agree_with_passes(profiles):
+    for p in profiles[:100]:
+        for rule in engine.RULES:
+            assert (not engine.failures(rule, p)) == engine.passes(rule, p)
+
+
+def test_profile_key_determines_result(rules, profiles):
+    """键相同的两个学生，匹配结果必须相同 (MatchMemo 依赖这一点)"""
+    index = engine.rule_index(rules)
+    seen = {}
+    for p in profiles:
+        result = engine.match(p, rules)
+        assert seen.setdefault(index.profile_key(p), result) == result
+
+
+def test_match_memo_equals_direct(rules, profiles):
+    memo = MatchMemo(rules, min_rules=0)
+    for p in profiles + profiles:
+        assert memo.match(p) == engine.match(p, rules)
+
+
+def test_jkpj_requires_science_a():
+    """JKPJ 的理科要求和 A- 计数都来自数据文件，不靠名称特判"""
+    grades = {"Bahasa Melayu": "A+", "Bahasa Inggeris": "A+", "Sejarah": "A+", "Matematik": "A+",
+              "Matematik Tambahan": "A+", "Fizik": "B", "Kimia": "A+", "Biologi": "A+", "Pendidikan Moral": "A+"}
+    jkpj = next(r for r in engine.RULES if r.name == "JPA JKPJ (日韩法德工程)")
+    assert jkpj.count_A_minus and not jkpj.sch["allow_A_minus"]
+    assert {sub: lowest for sub, lowest, _ in jkpj.hard_req} == {
+        "Matematik": engine.RANK_A, "Matematik Tambahan": engine.RANK_A, "Fizik": engine.RANK_A}
+    p = engine.make_profile(grades, "Selangor", False, False, 10.0)
+    assert not engine.passes(jkpj, p)
+    assert engine.passes(jkpj, engine.make_profile(dict(grades, Fizik="A"), "Selangor", False, False, 10.0))
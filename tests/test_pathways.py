@@ -0,0 +1,52 @@
+"""本地升学路径建议：按成绩套用入学标准小抄"""
+import engine
+import pathways
+from pathways import POSSIBLE, RECOMMENDED, UNLIKELY
+
+ALL_A = {"Bahasa Melayu": "A+", "Sejarah": "A", "Matematik": "A+", "Bahasa Inggeris": "A", "Fizik": "A", "Kimia": "A-"}
+C_D = {"Bahasa Melayu": "C", "Sejarah": "D", "Matematik": "D", "Bahasa Inggeris": "E", "Sains": "C"}
+
+
+def advise(grades, eligible=()):
+    return pathways.advise(engine.make_profile(grades, "Selangor", False, False, 8.5), eligible)
+
+
+def levels(advice):
+    return {f.key: f.level for f in advice.fits}
+
+
+def test_no_grades():
+    advice = advise({})
+    assert advice.fits == ()
+    assert "先在上方填写" in advice.summary
+
+
+def test_strong_results_prefer_asasi_and_matrikulasi():
+    got = levels(advise(ALL_A))
+    assert got["asasi"] == RECOMMENDED
+    assert got["matrikulasi"] == RECOMMENDED
+    assert got["stpm"] == POSSIBLE
+
+
+def test_stpm_needs_credit_in_bm_and_sejarah():
+    got = levels(advise(C_D))
+    assert got["stpm"] == UNLIKELY
+    assert got["asasi"] == UNLIKELY
+    assert levels(advise(dict(C_D, Sejarah="C")))["stpm"] == RECOMMENDED
+
+
+def test_fits_sorted_by_level(profiles):
+    order = [RECOMMENDED, POSSIBLE, UNLIKELY]
+    for p in profiles:
+        advice = pathways.advise(p)
+        assert len(advice.fits) == len(pathways.PATHWAYS)
+        ranks = [order.index(f.level) for f in advice.fits]
+        assert ranks == sorted(ranks)
+        assert all(f.reasons for f in advice.fits)
+
+
+def test_summary_mentions_eligible_count():
+    advice = advise(ALL_A, eligible=[{"name": "X"}, {"name": "Y"}])
+    assert advice.summary.startswith("你符合 2 个")
+    data = advice.to_dict()
+    assert [p["key"] for p in data["pathways"]] == [f.key for f in advice.fits]
@@ -0,0 +1,46 @@
+"""AI prompt：输入 token 预算与可缓存的固定 system 前缀"""
+import pytest
+
+import engine
+import ranking
+from benchmarks.synth import synth_catalogue
+from prompts import (INPUT_TOKEN_BUDGET, STATIC_SYSTEM_MESSAGE, build_ai_prompt, build_messages,
+                     estimate_messages_tokens)
+from scholarship_data import SUBJECT_LIST
+
+
+def student(n_subjects=9, grade="A", koko=8.5, state="Selangor"):
+    grades = {sub: grade for sub in SUBJECT_LIST[:n_subjects]}
+    return engine.make_profile(grades, state, False, False, koko)
+
+
+@pytest.mark.parametrize("n_subjects, n_eligible, wish", [
+    (9, 0, ""),
+    (9, 31, "想读医科"),
+    (20, 500, "我想出国读工程" * 715),  # 5000 个中文字符
+    (20, 500, "I want to study abroad. " * 200),
+])
+def test_prompt_within_budget(n_subjects, n_eligible, wish):
+    eligible = synth_catalogue(n_eligible, seed=3)
+    prompt = build_ai_prompt(student(n_subjects), "Islam", "Melayu", wish, eligible, total=n_eligible)
+    assert estimate_messages_tokens(build_messages(prompt)) <= INPUT_TOKEN_BUDGET
+
+
+def test_long_lists_are_truncated_with_count():
+    eligible = synth_catalogue(500, seed=3)
+    prompt = build_ai_prompt(student(20), "Islam", "Melayu", "想读医科", eligible, total=500)
+    shown = prompt.count(" #")
+    assert 0 < shown < 500
+    assert f"- ... and {500 - shown} more\n" in prompt
+
+
+def test_system_message_is_identical_across_students():
+    a = student(9, "A+", 10.0, "Sabah")
+    b = student(12, "C", 5.0, "Johor")
+    prompt_a = build_ai_prompt(a, "Islam", "Melayu", "想读医科", engine.match(a))
+    prompt_b = build_ai_prompt(b, "Buddhism", "Chinese", "engineering", ranking.top_k(b, engine.match(b), k=3))
+    system_a, user_a = build_messages(prompt_a)
+    system_b, user_b = build_messages(prompt_b)
+    assert system_a["content"].encode("utf-8") == system_b["content"].encode("utf-8")
+    assert system_a["content"] is STATIC_SYSTEM_MESSAGE
+    assert user_a["content"] != user_b["content"]
@@ -0,0 +1,55 @@
+"""匹配度排序：top_k 与完整排序一致，等级优先，分数相同保持目录顺序"""
+import pytest
+
+import engine
+import ranking
+from benchmarks.synth import synth_catalogue
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return engine.compile_rules(synth_catalogue(400, seed=3))
+
+
+def _score(rules, sch, p):
+    rule = next(r for r in rules if r.sch is sch)
+    return ranking.score(rule, p)
+
+
+def test_top_k_is_prefix_of_full_ranking(rules, profiles):
+    for p in profiles[:100]:
+        eligible = engine.match(p, rules)
+        full = ranking.top_k(p, eligible, rules)
+        assert sorted(map(id, full)) == sorted(map(id, eligible))
+        for k in (0, 1, 5, 10, len(eligible) + 3):
+            assert ranking.top_k(p, eligible, rules, k) == full[:k]
+
+
+def test_scores_descending_ties_in_catalogue_order(rules, profiles):
+    position = {id(r.sch): r.index for r in rules}
+    for p in profiles[:100]:
+        full = ranking.top_k(p, engine.match(p, rules), rules)
+        keys = [(_score(rules, s, p), -position[id(s)]) for s in full]
+        assert keys == sorted(keys, reverse=True)
+
+
+def test_tier_dominates_fit(profiles):
+    for p in profiles:
+        tiers = [ranking.tier_of(s) for s in ranking.top_k(p, engine.match(p))]
+        assert tiers == sorted(tiers)
+
+
+def test_fit_bounds(profiles):
+    for p in profiles[:200]:
+        for sch in engine.match(p):
+            rule = next(r for r in engine.RULES if r.sch is sch)
+            assert 0.0 <= ranking.fit(rule, p) <= ranking.FIT_MAX
+
+
+def test_tier_of():
+    base = {"min_A_plus": 0, "min_A_total": 3}
+    assert ranking.tier_of(dict(base, tier=1)) == 1
+    assert ranking.tier_of(dict(base, min_A_plus=9, kind="loan")) == 3
+    assert ranking.tier_of(dict(base, min_A_total=8)) == 1
+    assert ranking.tier_of(dict(base, min_A_total=6)) == 2
+    assert ranking.tier_of(base) == 3
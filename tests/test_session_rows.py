@@ -0,0 +1,59 @@
+"""科目表格的紧凑会话状态与孤儿控件 key"""
+import session_rows
+from scholarship_data import SUBJECT_LIST
+from session_rows import PLACEHOLDER, SubjectRows
+
+SUBJECTS = tuple(SUBJECT_LIST)
+
+
+def test_add_set_delete_and_grades():
+    rows = SubjectRows(SUBJECTS, [("Sejarah", "A"), ("Matematik", "B"), ("Sejarah", "C")])
+    assert len(rows) == 3
+    # 重复科目以最后一行为准
+    assert rows.grades() == {"Sejarah": "C", "Matematik": "B"}
+
+    row_id = rows.add()
+    assert list(rows)[-1] == (row_id, PLACEHOLDER, PLACEHOLDER)
+    rows.set(3, "Fizik", "A+")
+    assert rows.grades()["Fizik"] == "A+"
+
+    assert rows.delete(0) and not rows.delete(0)
+    assert [r[0] for r in rows] == [1, 2, 3]
+    # 行号只增不减，删除后不会复用
+    assert rows.add() == 4
+
+
+def test_unknown_values_become_placeholder():
+    rows = SubjectRows(SUBJECTS, [("不存在的科目", "A"), ("Sejarah", "Z")])
+    assert [(s, g) for _, s, g in rows] == [(PLACEHOLDER, "A"), ("Sejarah", PLACEHOLDER)]
+    assert rows.grades() == {}
+
+
+def test_rebase_keeps_subjects_by_name():
+    rows = SubjectRows(SUBJECTS, [("Sejarah", "A"), ("Fizik", "B")])
+    rows.rebase(tuple(s for s in reversed(SUBJECTS) if s != "Fizik"))
+    assert [(s, g) for _, s, g in rows] == [("Sejarah", "A"), (PLACEHOLDER, "B")]
+
+
+def test_more_than_255_subjects():
+    subjects = tuple(f"Subjek {i}" for i in range(600))
+    rows = SubjectRows(subjects, [("Subjek 599", "A+")])
+    rows.rebase(subjects[::-1])
+    assert rows.grades() == {"Subjek 599": "A+"}
+
+
+def test_orphan_widget_keys():
+    rows = SubjectRows(SUBJECTS, [("Sejarah", "A"), ("Fizik", "B")])
+    rows.delete(0)
+    keys = [*session_rows.widget_keys(0), *session_rows.widget_keys(1), "sub_3f2a-uuid", "rows", "analysis"]
+    assert sorted(session_rows.orphan_widget_keys(keys, rows)) == ["del_0", "grade_0", "sub_0", "sub_3f2a-uuid"]
+
+
+def test_session_memory_counts_keys():
+    rows = SubjectRows(SUBJECTS, [("Sejarah", "A")])
+    state = {"rows": rows, "sub_0": "Sejarah", "grade_0": "A", "sub_9": "Fizik"}
+    report = session_rows.session_memory(state, SUBJECTS)
+    assert report["keys"] == 4
+    assert report["widget_keys"] == 3
+    assert report["orphans"] == 1
+    assert report["total_bytes"] == sum(report["by_key"].values()) > 0
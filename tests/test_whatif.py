@@ -0,0 +1,60 @@
+"""“差一点”升级方案：方案有效，并且与小范围暴力搜索相比改动最少"""
+from itertools import combinations, product
+
+import engine
+import whatif
+from engine import RANK_A_PLUS, RANK_NONE
+
+
+def brute_force(rule, p, max_subjects=2):
+    """最多改 max_subjects 科、每科升到任意更高等级的所有组合里，(科目数, 级数) 最小的；没有则 None"""
+    subjects = sorted(set(p.ranks) | {sub for sub, _, _ in rule.hard_req})
+    for n in range(1, max_subjects + 1):
+        best = None
+        for subs in combinations(subjects, n):
+            current = [p.ranks.get(s, RANK_NONE) for s in subs]
+            options = [range(r + 1, RANK_A_PLUS + 1) for r in current]
+            for targets in product(*options):
+                if engine.passes(rule, whatif._apply(p, dict(zip(subs, targets)))):
+                    steps = sum(t - r for t, r in zip(targets, current))
+                    best = steps if best is None else min(best, steps)
+        if best is not None:
+            return n, best
+    return None
+
+
+def test_upgrades_make_student_eligible(profiles):
+    for p in profiles[:200]:
+        for m in whatif.near_misses(p):
+            rule = next(r for r in engine.RULES if r.sch is m.sch)
+            changes = {u.subject: engine.GRADE_RANK[u.to_grade] for u in m.upgrades}
+            assert not engine.passes(rule, p)
+            assert engine.passes(rule, whatif._apply(p, changes))
+            assert all(u.steps > 0 for u in m.upgrades)
+
+
+def test_plans_are_minimal(profiles):
+    index = engine.rule_index(engine.RULES)
+    for p in profiles[:25]:
+        for k in index.iter_bits(index.gates(p)):
+            rule = engine.RULES[k]
+            if engine.passes(rule, p):
+                continue
+            best = brute_force(rule, p)
+            upgrades = whatif.upgrades_for(rule, p)
+            if best is None:
+                # 改两科以内做不到：方案 (如果有) 一定要改更多科
+                assert upgrades is None or len(upgrades) > 2
+            else:
+                assert upgrades is not None
+                assert (len(upgrades), sum(u.steps for u in upgrades)) == best, rule.name
+
+
+def test_near_misses_sorted_and_capped(profiles):
+    for p in profiles[:100]:
+        report = whatif.near_misses(p, max_upgrades=3)
+        assert all(len(m.upgrades) <= 3 for m in report)
+        costs = [(len(m.upgrades), m.steps) for m in report]
+        assert costs == sorted(costs)
+        eligible = {id(s) for s in engine.match(p)}
+        assert not any(id(m.sch) in eligible for m in report)
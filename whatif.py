@@ -0,0 +1,164 @@
+"""
+“还差什么？” —— 对每个不符合的奖学金，找出最少的成绩提升 (不依赖 Streamlit)
+
+改成绩改变不了的条件 (州属、土著 / 宗教、Koko) 先用 RuleIndex.gates() 位图排除。
+剩下的规则按三步构造升级方案，不做成绩组合的暴力搜索：
+
+1. 必须的提升：不符合 hard_req 的科目升到最低可接受等级；
+   must_all_A_minus 时所有低于 A- 的科目升到 A-
+2. 数量缺口：A+ 缺 d+ 个、A (或含 A-) 缺 dA 个。低于 A 的科目升到 A+ 可以同时补两个缺口，
+   所以只枚举“有几个 A+ 来自低于 A 的科目” (最多十几种)，每种情况按“已改过的科目优先、
+   离目标最近优先”取科目；以 (改动科目数, 提升级数) 最小为准
+3. 用 engine.passes 对升级后的成绩重新判定一次，确保方案确实有效
+
+    python whatif.py          # 示例学生的“差一点”列表与耗时
+"""
+from dataclasses import dataclass
+
+import engine
+from engine import RANK_A, RANK_A_MINUS, RANK_A_PLUS, RANK_NONE, RULES
+
+RANK_GRADE = {r: g for g, r in engine.GRADE_RANK.items()}
+NOT_TAKEN = "未考"
+
+
+@dataclass(frozen=True, slots=True)
+class Upgrade:
+    """一个科目的提升"""
+    subject: str
+    from_grade: str
+    to_grade: str
+    steps: int
+
+
+@dataclass(frozen=True, slots=True)
+class NearMiss:
+    """差一点符合的奖学金 + 最少升级方案"""
+    sch: dict
+    upgrades: tuple
+    steps: int
+
+
+# --- 1. 单个规则的升级方案 ---
+
+def _next_accepted(current, lowest, holes):
+    """高于当前等级、且可接受的最低序数；没有则返回 None"""
+    for r in range(max(current + 1, lowest), RANK_A_PLUS + 1):
+        if r not in holes:
+            return r
+    return None
+
+
+def _fill_counts(target, changed, d_plus, d_a, threshold):
+    """补 A+ / A 数量缺口；返回 (升 A+ 的科目, 升到门槛的科目)，科目不够时返回 None"""
+    key = lambda sub: (sub not in changed, -target[sub])
+    high = sorted((s for s, r in target.items() if threshold <= r < RANK_A_PLUS), key=key)
+    low = sorted((s for s, r in target.items() if r < threshold), key=key)
+
+    best = None
+    for x in range(min(d_plus, len(low)) + 1):
+        n_high = d_plus - x
+        n_low = max(0, d_a - x)
+        if n_high > len(high) or x + n_low > len(low):
+            continue
+        to_plus = high[:n_high] + low[:x]
+        to_threshold = low[x:x + n_low]
+        subjects = changed.union(to_plus, to_threshold)
+        steps = (sum(RANK_A_PLUS - target[s] for s in to_plus)
+                 + sum(threshold - target[s] for s in to_threshold))
+        cost = (len(subjects), steps)
+        if best is None or cost < best[0]:
+            best = (cost, to_plus, to_threshold)
+    return None if best is None else best[1:]
+
+
+def plan(rule, p):
+    """返回 {科目: 目标序数}；成绩以外的条件不符合、或科目数量不够时返回 None"""
+    target = dict(p.ranks)
+    changed = set()
+
+    def raise_to(sub, r):
+        if target.get(sub, RANK_NONE) < r:
+            target[sub] = r
+            changed.add(sub)
+
+    for sub, lowest, holes in rule.hard_req:
+        current = target.get(sub, RANK_NONE)
+        if current < lowest or current in holes:
+            r = _next_accepted(current, lowest, holes)
+            if r is None:
+                return None
+            raise_to(sub, r)
+    if rule.must_all_A_minus:
+        for sub, r in list(target.items()):
+            if r < RANK_A_MINUS:
+                raise_to(sub, RANK_A_MINUS)
+
+    threshold = RANK_A_MINUS if rule.count_A_minus else RANK_A
+    ranks = target.values()
+    d_plus = rule.min_A_plus - sum(r == RANK_A_PLUS for r in ranks)
+    d_a = rule.min_A_total - sum(r >= threshold for r in ranks)
+    if d_plus > 0 or d_a > 0:
+        picks = _fill_counts(target, changed, max(0, d_plus), max(0, d_a), threshold)
+        if picks is None:
+            return None
+        for sub in picks[0]:
+            raise_to(sub, RANK_A_PLUS)
+        for sub in picks[1]:
+            raise_to(sub, threshold)
+
+    return {sub: target[sub] for sub in changed}
+
+
+def _apply(p, changes):
+    grades = dict(p.grades)
+    grades.update((sub, RANK_GRADE[r]) for sub, r in changes.items())
+    return engine.make_profile(grades, p.state, p.is_muslim, p.is_bumi, p.koko)
+
+
+def upgrades_for(rule, p):
+    """经过重新判定的升级列表 (按科目提升级数从小到大)；找不到有效方案时返回 None"""
+    changes = plan(rule, p)
+    if not changes or not engine.passes(rule, _apply(p, changes)):
+        return None
+    out = [
+        Upgrade(sub, p.grades.get(sub, NOT_TAKEN), RANK_GRADE[r], r - p.ranks.get(sub, RANK_NONE))
+        for sub, r in changes.items()
+    ]
+    out.sort(key=lambda u: (u.steps, u.subject))
+    return tuple(out)
+
+
+# --- 2. 整份报告 ---
+
+def near_misses(profile, rules=RULES, max_upgrades=None):
+    """所有“只差成绩”的奖学金，按 (改动科目数, 提升级数, 目录顺序) 排序"""
+    index = engine.rule_index(rules)
+    out = []
+    # 门槛 (州属 / 身份 / Koko) 不符合的改成绩也没用，直接跳过；已符合的不算
+    for k in index.iter_bits(index.gates(profile)):
+        if engine.passes(rules[k], profile):
+            continue
+        upgrades = upgrades_for(rules[k], profile)
+        if upgrades is None or (max_upgrades is not None and len(upgrades) > max_upgrades):
+            continue
+        out.append(NearMiss(sch=rules[k].sch, upgrades=upgrades, steps=sum(u.steps for u in upgrades)))
+    out.sort(key=lambda m: (len(m.upgrades), m.steps))
+    return out
+
+
+if __name__ == "__main__":
+    import time
+
+    student = engine.make_profile(
+        {"Bahasa Melayu": "A", "Bahasa Inggeris": "A-", "Sejarah": "B+", "Matematik": "A",
+         "Matematik Tambahan": "B", "Fizik": "A-", "Kimia": "B+", "Biologi": "A", "Pendidikan Moral": "A"},
+        "Selangor", is_muslim=False, is_bumi=False, koko=8.6,
+    )
+    t0 = time.perf_counter()
+    report = near_misses(student)
+    elapsed = (time.perf_counter() - t0) * 1000
+    for m in report:
+        steps = "，".join(f"{u.subject} {u.from_grade}→{u.to_grade}" for u in m.upgrades)
+        print(f"{m.sch['name']}: {steps}")
+    print(f"\n{len(report)} 个奖学金，用时 {elapsed:.2f} ms")